@@ -1,65 +1,167 @@
 import utility as util
+from hamerlyBounds import HamerlyBounds
+from kMeansModel import KMeansModel
 
 import sklearn.cluster as skc
 import numpy as np
 from collections import Counter, defaultdict
+import itertools as it
 from enum import Enum
-import sys
+from concurrent.futures import ThreadPoolExecutor
+import os
 import matplotlib.pyplot as plt
 
 class KMeans:
     """Implements the K-Means algorithm."""
 
+    class Algorithm(Enum):
+        LLOYD = 1
+        HAMERLY = 2
+        MINI_BATCH = 3
+
+    class Initialization(Enum):
+        RANDOM = 1
+        K_MEANS_PLUS_PLUS = 2
+        K_MEANS_PARALLEL = 3
+
     class KMeansOptions:
         """Configures the KNN algorithm."""
 
-        def __init__(self, max_K, sensitivity, repeat, seed):
+        def __init__(self, max_K, sensitivity, repeat, seed, block_size = 2 ** 22, algorithm = None, \
+            batch_size = 1024, max_batches = 100, initialization = None, n_jobs = 1, parallel_K = False, warm_start = False, max_iterations = 300, \
+            dtype = np.float64):
             """
             `max_K` -- The maximum value for K that `determine_best_K()` will try.\n
             `sensitivity` -- The algorithm will declare convergence if, after an iteration, the largest movement of all centroids is <= `sensitivity`\n
             `repeat` -- This is the number of times that the intra cluster distance will be measured for each K when deciding the best value for K.
                 This is necessary since the initialization of centroids in random which might affect the outcome.\n
             `seed` -- The seed to use for the random number generatior which is used for deciding on the start locations for the centroids.
+                Each repeat for each K gets its own random number generator that is derived from the seed, the K and the number of the repeat,
+                so the results do not depend on the order in which the repeats run or on `n_jobs`.\n
+            `block_size` -- The maximum number of sample-to-centroid distances that are calculated at once. This bounds the peak memory use. (Default = `2 ** 22`)\n
+            `algorithm` -- A member of `Algorithm`. `LLOYD` calculates the distance from every sample to every centroid in each iteration.
+                `HAMERLY` keeps distance bounds for each sample to skip most of those calculations once the centroids barely move.
+                Both find exactly the same centroids. `MINI_BATCH` updates the centroids from small random batches of samples instead of from all samples,
+                which is much cheaper and works for memory-mapped samples that do not fit in memory, but finds slightly worse centroids. If `None`, uses `LLOYD`. (Default = `None`)\n
+            `batch_size` -- The number of samples in each batch of `MINI_BATCH`. (Default = `1024`)\n
+            `max_batches` -- The maximum number of batches that `MINI_BATCH` uses before it stops, even if it did not converge. (Default = `100`)\n
+            `initialization` -- A member of `Initialization` indicating how the start locations of the centroids are chosen. `RANDOM` picks random samples.
+                `K_MEANS_PLUS_PLUS` picks samples one by one with a chance proportional to their squared distance to the nearest centroid picked so far,
+                which spreads the centroids out so that fewer iterations and repeats are needed. `K_MEANS_PARALLEL` (k-means||) picks many samples at once in a few rounds
+                and reduces them to K with k-means++, which needs fewer passes over the samples for large K. If `None`, uses `RANDOM`. (Default = `None`)\n
+            `n_jobs` -- The number of threads that run the repeats of `cluster()` at the same time. The distance calculations release the GIL so the repeats
+                run in parallel. If `-1`, uses one thread per processor. (Default = `1`)\n
+            `parallel_K` -- If `True`, `determine_best_K()` also clusters `n_jobs` values of K at the same time instead of one after another.
+                This may cluster a few values of K beyond the best K for nothing, but the best K that is found is the same. (Default = `False`)\n
+            `warm_start` -- If `True`, `determine_best_K()` starts the clustering for each K from the centroids of K - 1 with its worst cluster split in two
+                (like bisecting K-Means) instead of clustering each K `repeat` times from scratch. This is much faster and the distances decrease more smoothly with K,
+                but the clustering for each K may be slightly worse. `repeat` is then the number of tries for each split. `parallel_K` is ignored. (Default = `False`)\n
+            `max_iterations` -- The maximum number of iterations of `LLOYD` and `HAMERLY` before they stop, even if they did not converge.
+                Use `get_convergence()` to check if the last call to `cluster()` converged. (Default = `300`)\n
+            `dtype` -- The floating point type of the centroids and of the distance calculations. The samples are converted to it one block at a time,
+                so they can be stored in a smaller type (like the `np.float32` or `np.int32` samples from `importData`). Integer types are rejected
+                because the centroids would be rounded to whole numbers in every iteration. With `np.float32` the distance calculations
+                move half the memory and run up to about twice as fast, at the cost of rounding errors of about 1e-7 times the squared length of the samples.
+                The running totals of the centroids and the distances that are returned are always accumulated in `np.float64`. (Default = `np.float64`)
             """
             self.max_K, self.sensitivity, self.repeat, self.seed = max_K, sensitivity, repeat, seed
+            self.block_size = block_size
+            self.algorithm = algorithm if algorithm is not None else KMeans.Algorithm.LLOYD
+            self.batch_size, self.max_batches = batch_size, max_batches
+            self.initialization = initialization if initialization is not None else KMeans.Initialization.RANDOM
+            self.n_jobs, self.parallel_K, self.warm_start = n_jobs, parallel_K, warm_start
+            if max_iterations < 1:
+                raise Exception('max_iterations must be at least 1, but it is {}.'.format(max_iterations))
+            self.max_iterations = max_iterations
+            if not np.issubdtype(dtype, np.floating):
+                raise Exception('The dtype of the centroids must be a floating point type, but it is {}. '
+                    'Integer samples (like the np.int32 samples from importData) can be clustered with np.float32 centroids.'.format(np.dtype(dtype).name))
+            self.dtype = dtype
 
-    @staticmethod
-    def __get_closest_centroid_index_and_distance(sample, centroids):
-        """Returns the index into `centroids` of the centroid that is the closest to `sample` and the squared distance to that centroid.
-        
-        `sample` -- A sample. Must be an ndarray.\n
-        `centroids` -- A collection of centroids. Must be an ndarray with shape `[sample.shape[0]] + sample.shape` (i.e. it must be an array of arrays that have the same shape as `sample`.)
+    class Clustering:
+        """The result of clustering samples into K clusters.
+
+        `centroids` -- An ndarray with the K centroids.\n
+        `ids` -- A 1-d ndarray with the index into `centroids` of the cluster of each sample.\n
+        `distances_squared` -- A 1-d ndarray with the squared distance of each sample to the centroid of its cluster.\n
+        `inertia` -- The total intra-cluster distance: the sum of `distances_squared`.\n
+        `iterations` -- The number of iterations (or batches for `MINI_BATCH`) that were used.\n
+        `converged` -- Whether the centroids converged before `max_iterations` (or `max_batches`).
         """
-        closest_index = sys.maxsize
-        lowest_distance_squared = float('inf')
-        for i in range(centroids.shape[0]):
-            distance_squared = util.euclidean_squared(sample, centroids[i])
-            if distance_squared < lowest_distance_squared:
-                lowest_distance_squared, closest_index = distance_squared, i
 
-        return closest_index, lowest_distance_squared
+        def __init__(self, centroids, ids, distances_squared, iterations, converged):
+            self.centroids, self.ids, self.distances_squared = centroids, ids, distances_squared
+            self.inertia = distances_squared.sum()
+            self.iterations, self.converged = iterations, converged
+
+        def to_model(self, cluster_labels = None):
+            """Returns a `KMeansModel` with the centroids of this clustering to assign new samples to them. `cluster_labels` is an optional label for each cluster."""
+            return KMeansModel(self.centroids, cluster_labels)
+
+    @staticmethod
+    def __assign(samples, centroids, block_size):
+        """Assigns each sample to its closest centroid. The distances are calculated for blocks of samples at once.
+
+        `samples` -- An ndarray of samples. Must be an ndarray.\n
+        `centroids` -- The centroids. Must be an ndarray with shape `[samples[0].shape[0]] + samples[0].shape` (i.e. it must be an array of arrays that have the same shape as the `samples`.)\n
+        `block_size` -- The maximum number of distances that are calculated at once.
+
+        The first return value is a 1-d ndarray with the index into `centroids` of the closest centroid of each sample.
+        The second return value is a 1-d ndarray with the squared distance of each sample to that centroid."""
+        samples = samples.reshape(samples.shape[0], -1)
+        centroids = centroids.reshape(centroids.shape[0], -1)
+        ids = np.empty(samples.shape[0], dtype = np.intp)
+        distances_squared = np.empty(samples.shape[0])
+        chunk_size = max(1, block_size // centroids.shape[0])
+        for start in range(0, samples.shape[0], chunk_size):
+            block = util.euclidean_squared_batch(samples[start:start + chunk_size], centroids)
+            ids[start:start + chunk_size] = block.argmin(axis = 1)
+            distances_squared[start:start + chunk_size] = np.take_along_axis(block, ids[start:start + chunk_size, np.newaxis], axis = 1)[:, 0]
+
+        return ids, distances_squared
+
+    @staticmethod
+    def __distances_to_assigned(samples, centroids, ids, block_size):
+        """Returns a 1-d ndarray with the squared distance of each sample to `centroids[ids]`. This only calculates one distance per sample."""
+        samples = samples.reshape(samples.shape[0], -1)
+        centroids = centroids.reshape(centroids.shape[0], -1)
+        distances_squared = np.empty(samples.shape[0])
+        chunk_size = max(1, block_size // samples.shape[1])
+        for start in range(0, samples.shape[0], chunk_size):
+            differences = samples[start:start + chunk_size] - centroids[ids[start:start + chunk_size]]
+            distances_squared[start:start + chunk_size] = (differences ** 2).sum(axis = 1, dtype = np.float64)
+
+        return distances_squared
 
     @staticmethod
-    def __calculate_centroids(samples, centroids):
+    def __calculate_centroids(samples, centroids, block_size, bounds):
         """Given a set of clusters defined by `centroids`, recalculates the actual centroids of those clusters by assigning each sample
         to its closest centroid and then averages all points of the samples per cluster except for that the final division is skipped.
         In other words, the new centroids act as running totals while adding samples to it.
         
         `samples` -- An ndarray of samples. Must be an ndarray.\n
-        `centroids` -- The old centroids. Must be an ndarray with shape `[samples[0].shape[0]] + samples[0].shape` (i.e. it must be an array of arrays that have the same shape as the `samples`.)
+        `centroids` -- The old centroids. Must be an ndarray with shape `[samples[0].shape[0]] + samples[0].shape` (i.e. it must be an array of arrays that have the same shape as the `samples`.)\n
+        `block_size` -- The maximum number of distances that are calculated at once.\n
+        `bounds` -- A `HamerlyBounds` instance for the `samples` to assign the samples with or `None` to calculate all distances.
         
         The first return value is an 1-d ndarray with the sample count for each cluster.
-        The second return value is an ndarray with the new centroids with the same shape as `centroids`."""
-        new_centroid_counts = np.zeros(centroids.shape[0], dtype = np.int)
-        new_centroids = np.zeros(centroids.shape, dtype = centroids.dtype)
-
-        for sample in samples:
-            # Add the sample to the choosen new centroid (new centroids act as running totals).
-            centroid_index, _ = KMeans.__get_closest_centroid_index_and_distance(sample, centroids)
-            new_centroids[centroid_index] += sample
-            new_centroid_counts[centroid_index] += 1
+        The second return value is an ndarray with the new centroids with the same shape as `centroids`. The running totals are always `np.float64`.
+        The third and fourth return values are the index of the closest centroid of each sample and the squared distance to it, as returned by `__assign()`.
+        With `bounds`, the distances are upper bounds."""
+        if bounds is not None:
+            ids = bounds.assign(centroids)
+            distances_squared = bounds.distances_squared()
+        else:
+            ids, distances_squared = KMeans.__assign(samples, centroids, block_size)
+
+        # Add the samples to their choosen new centroids (new centroids act as running totals) one dimension at a time.
+        new_centroid_counts = np.bincount(ids, minlength = centroids.shape[0])
+        new_centroids = np.empty(centroids.shape)
+        flat_samples, flat_centroids = samples.reshape(samples.shape[0], -1), new_centroids.reshape(centroids.shape[0], -1)
+        for dimension in range(flat_samples.shape[1]):
+            flat_centroids[:, dimension] = np.bincount(ids, weights = flat_samples[:, dimension], minlength = centroids.shape[0])
         
-        return new_centroid_counts, new_centroids
+        return new_centroid_counts, new_centroids, ids, distances_squared
 
     @staticmethod
     def __calculate_centroid_movement(centroids, new_centroids):
@@ -77,72 +179,205 @@ class KMeans:
         return centroid_movement
 
     @staticmethod
-    def __reset_empty_clusters(samples, empty_cluster_indices, centroids, rng):
-        """Replaces each empty cluster (defined by `centroids`) with a random sample from `samples`.
-        Also makes sure that centroids are not placed on the same sample.
+    def __repair_empty_clusters(samples, centroids, new_centroid_counts, new_centroids, ids, distances_squared):
+        """Moves each empty cluster onto one of the samples that are the farthest from their centroid, in a single step without assigning the samples again.
+        Those samples are taken out of the running totals of their old clusters. A cluster that is still empty afterwards keeps its old centroid.
+        This happens when there are fewer samples that are not on their centroid than there are empty clusters, or when all samples of a cluster were taken.
         
-        `samples` -- An ndarray of samples to choose random samples from in case a centroid is empty. Must be an ndarray.\n
-        `empty_cluster_indices` -- Must be an ndarray containing indices of the centroids that are empty (isn't the closest centroid for any of the `samples`).\n
-        `centroids` -- The centroids. Must be an ndarray with shape `[samples[0].shape[0]] + samples[0].shape` (i.e. it must be an array of arrays that have the same shape as the `samples`.)\n
-        `rng` -- A NumPy RandomState instance.
+        `samples` -- An ndarray of samples. Must be an ndarray.\n
+        `centroids` -- The old centroids.\n
+        `new_centroid_counts`, `new_centroids`, `ids` -- The return values of `__calculate_centroids()` for `centroids`.
+            The counts, running totals and ids are changed in place so that every cluster has at least one sample.\n
+        `distances_squared` -- The exact squared distance of each sample to its centroid, as returned by `__distances_to_assigned()`.
         """
-        random_samples = samples[rng.choice(samples.shape[0], empty_cluster_indices.shape[0], replace = False)]
-        centroids[empty_cluster_indices] = random_samples
+        empty_cluster_indices = np.nonzero(new_centroid_counts == 0)[0]
+        flat_samples, flat_totals = samples.reshape(samples.shape[0], -1), new_centroids.reshape(new_centroids.shape[0], -1)
+
+        farthest = np.argpartition(-distances_squared, empty_cluster_indices.shape[0] - 1)[:empty_cluster_indices.shape[0]]
+        farthest = farthest[np.argsort(-distances_squared[farthest], kind = 'stable')]
+        farthest = farthest[distances_squared[farthest] > 0]
+        np.subtract.at(new_centroid_counts, ids[farthest], 1)
+        np.subtract.at(flat_totals, ids[farthest], flat_samples[farthest])
+        new_centroid_counts[empty_cluster_indices[:farthest.shape[0]]] = 1
+        flat_totals[empty_cluster_indices[:farthest.shape[0]]] = flat_samples[farthest]
+        ids[farthest] = empty_cluster_indices[:farthest.shape[0]]
+
+        still_empty = new_centroid_counts == 0
+        new_centroid_counts[still_empty] = 1
+        new_centroids[still_empty] = centroids[still_empty]
 
     @staticmethod
-    def __calculate_intra_distance(samples, centroids):
-        """Returns the total within-cluster distance, also known as the intra cluster distance, as the sum of squares of distances.
-        
-        `samples` -- An ndarray of samples. Must be an ndarray.\n
-        `centroids` -- The centroids. Must be an ndarray with shape `[samples[0].shape[0]] + samples[0].shape` (i.e. it must be an array of arrays that have the same shape as the `samples`.)
+    def __k_means_plus_plus(samples, K, rng, sample_weights = None):
+        """Returns the indices of `K` samples that are picked with k-means++. Each next sample is picked with a chance proportional to
+        its squared distance to the nearest sample picked so far (multiplied by its weight in `sample_weights`, if given)."""
+        sample_weights = sample_weights if sample_weights is not None else np.ones(samples.shape[0])
+        indices = [rng.choice(samples.shape[0], p = sample_weights / sample_weights.sum())]
+        distances_squared = util.euclidean_squared_batch(samples, samples[indices])[:, 0]
+        for _ in range(1, K):
+            chances = distances_squared * sample_weights
+            if chances.sum() == 0:
+                # All samples lie on a picked sample already, so any sample that was not picked will do.
+                chances = np.ones(samples.shape[0])
+                chances[indices] = 0
+            indices.append(rng.choice(samples.shape[0], p = chances / chances.sum()))
+            np.minimum(distances_squared, util.euclidean_squared_batch(samples, samples[indices[-1:]])[:, 0], out = distances_squared)
+
+        return np.array(indices)
+
+    @staticmethod
+    def __k_means_parallel(samples, K, rng, rounds = 5):
+        """Returns `K` start locations for the centroids that are picked with k-means|| (scalable k-means++).
+
+        In each of the `rounds`, about 2 * `K` samples are picked at once with a chance proportional to their squared distance to the nearest picked sample.
+        The picked samples are weighted by the number of samples that are closest to them and reduced to `K` with a weighted k-means++."""
+        candidates = [rng.randint(samples.shape[0])]
+        distances_squared = util.euclidean_squared_batch(samples, samples[candidates])[:, 0]
+        for _ in range(rounds):
+            if distances_squared.sum() == 0:
+                break
+            picked = np.nonzero(rng.rand(samples.shape[0]) < 2 * K * distances_squared / distances_squared.sum())[0]
+            candidates.extend(picked)
+            if picked.shape[0] > 0:
+                np.minimum(distances_squared, util.euclidean_squared_batch(samples, samples[picked]).min(axis = 1), out = distances_squared)
+
+        candidates = np.unique(candidates)
+        if candidates.shape[0] < K:
+            candidates = np.union1d(candidates, rng.choice(samples.shape[0], K, replace = False))
+        closest = util.euclidean_squared_batch(samples, samples[candidates]).argmin(axis = 1)
+        sample_weights = np.bincount(closest, minlength = candidates.shape[0]).astype(np.float64)
+        return samples[candidates[KMeans.__k_means_plus_plus(samples[candidates], K, rng, sample_weights)]]
+
+    @staticmethod
+    def __initial_centroids(samples, K, initialization, dtype, rng):
+        """Returns `K` start locations for the centroids of type `dtype` picked from `samples` according to `initialization` (a member of `Initialization`)."""
+        if initialization == KMeans.Initialization.K_MEANS_PLUS_PLUS:
+            centroids = samples[KMeans.__k_means_plus_plus(samples, K, rng)]
+        elif initialization == KMeans.Initialization.K_MEANS_PARALLEL:
+            centroids = KMeans.__k_means_parallel(samples, K, rng)
+        else:
+            centroids = samples[rng.choice(samples.shape[0], K, replace = False)]
+        return centroids.astype(dtype)
+
+    @staticmethod
+    def __random_batches(samples, batch_size, rng):
+        """Yields batches of `batch_size` random samples from `samples` forever. The samples in a batch are in the same order as in `samples`
+        so that a memory-mapped `samples` is read front to back."""
+        while True:
+            yield samples[np.sort(rng.randint(samples.shape[0], size = batch_size))]
+
+    @staticmethod
+    def __find_mini_batch_centroids(batches, K, options, rng, centroids = None):
+        """Calculates `K` centroids with the mini-batch K-Means algorithm. Only one batch of samples is in memory at a time.
+
+        The centroids start at samples from the first batch that are picked according to `initialization`. For each batch, each sample is assigned to its closest centroid and each centroid is moved
+        towards its samples with a learning rate of 1 / (the number of samples assigned to it so far). This stops when the largest movement
+        of any centroid is lower than `sensitivity`, after `max_batches` batches, or when there are no more batches.
+
+        `batches` -- An iterable of ndarrays of samples.\n
+        `K` -- The number of clusters to find.\n
+        `options` -- A KMeansOptions instance.\n
+        `rng` -- A NumPy RandomState instance.\n
+        `centroids` -- The `K` centroids to start with. If `None`, they are picked from the first batch. (Default = `None`)
 
-        Returns the total intra-cluster distance.
+        Returns an ndarray of `K` centroids of shape `[K] + samples[0].shape` (i.e. an array of arrays that have the same shape as the samples.)
+        Also returns the number of batches that were used and whether the centroids converged.
         """
-        total_distance = 0
-        for sample in samples:
-            _, distance_squared = KMeans.__get_closest_centroid_index_and_distance(sample, centroids)
-            total_distance += distance_squared
+        centroid_counts, batch_count, converged = np.zeros(K), 0, False
+        if centroids is not None:
+            centroids = centroids.astype(options.dtype)
+        for batch in it.islice(batches, options.max_batches):
+            batch_count += 1
+            if centroids is None:
+                centroids = KMeans.__initial_centroids(batch, K, options.initialization, options.dtype, rng)
 
-        return total_distance
+            batch_counts, batch_totals, _, _ = KMeans.__calculate_centroids(batch, centroids, options.block_size, None)
+
+            # Moving a centroid towards each of its samples one by one with a learning rate of 1 / count is the same as
+            # moving it to the weighted average of itself (weighted by its old count) and its new samples.
+            centroid_counts += batch_counts
+            new_centroids = centroids.copy()
+            updated = batch_counts > 0
+            new_centroids[updated] += (batch_totals[updated] - batch_counts[updated].reshape(-1, 1) * centroids[updated]) / centroid_counts[updated].reshape(-1, 1)
+
+            centroid_movement = KMeans.__calculate_centroid_movement(centroids, new_centroids)
+            centroids = new_centroids
+            if centroid_movement.max() <= options.sensitivity ** 2:
+                converged = True
+                break
+
+        return centroids, batch_count, converged
 
     @staticmethod
-    def __find_stable_centroids(samples, K, sensitivity, rng):
+    def __find_stable_centroids(samples, K, options, rng, centroids = None):
         """This is the core of the K-Means algorithm. This method calculates `K` stable centroids for the `samples` by iteratively assigning each sample to a cluster
-        and recalculate the centroids. This stops when the largest movement of any centroid is lower than `sensitivity`.
+        and recalculate the centroids. This stops when the largest movement of any centroid is lower than `sensitivity` (from `options`) or after `max_iterations`.
         
         `samples` -- An ndarray of samples to cluster. Must be an ndarray.\n
         `K` -- The number of clusters to find.\n
-        `sensitivity` -- The upper bound of allowed movement of centroids after an iteration.\n
-        `rng` -- A NumPy RandomState instance.
+        `options` -- A KMeansOptions instance.\n
+        `rng` -- A NumPy RandomState instance.\n
+        `centroids` -- The `K` centroids to start with. If `None`, they are picked according to `initialization` (from `options`). (Default = `None`)
         
-        Returns an ndarray of `K` centroids of shape `[K] + samples[0].shape` (i.e. an array of arrays that have the same shape as the `samples`.)
+        Returns a `Clustering` with `K` centroids of shape `[K] + samples[0].shape` (i.e. an array of arrays that have the same shape as the `samples`.)
+        The ids are the assignment of the final iteration, so no extra pass over the samples is needed to find them. The centroids moved at most `sensitivity`
+        in that iteration, so a sample on the edge of two clusters may be slightly closer to the other centroid now. The distances are calculated to the final centroids.
+        With `MINI_BATCH` an extra pass over all samples is done to assign them.
         """
-        # Determine K random centroids to start with
-        centroids = samples[rng.choice(samples.shape[0], K, replace = False)].astype(np.float64)
-        while True:
-            new_centroid_counts, new_centroids = KMeans.__calculate_centroids(samples, centroids)
-
-            # Now check if there are any empty clusters (centroids without assigned samples).
-            # If so, reset those centroids to a random sample and recalculate all centroids. Repeat until there are no empty clusters.
-            # In a bad case this will not stop. This means that K is way to high anyway. TODO: need to handle this case in a sensible way. Raise an error?
-            while True:
-                empty_cluster_indices = np.nonzero(new_centroid_counts == 0)[0]
-                if empty_cluster_indices.shape[0] == 0:
-                    break
-                KMeans.__reset_empty_clusters(samples, empty_cluster_indices, new_centroids, rng)
-                new_centroid_counts[empty_cluster_indices] = 1
-                new_centroids /= new_centroid_counts.reshape(-1, 1)
-                new_centroid_counts, new_centroids = KMeans.__calculate_centroids(samples, new_centroids)
-                
+        if options.algorithm == KMeans.Algorithm.MINI_BATCH:
+            centroids, batch_count, converged = KMeans.__find_mini_batch_centroids(KMeans.__random_batches(samples, options.batch_size, rng), K, options, rng, centroids)
+            ids, distances_squared = KMeans.__assign(samples, centroids, options.block_size)
+            return KMeans.Clustering(centroids, ids, distances_squared, batch_count, converged)
+
+        # Determine K centroids to start with
+        if centroids is None:
+            centroids = KMeans.__initial_centroids(samples, K, options.initialization, options.dtype, rng)
+        centroids = centroids.astype(options.dtype, copy = False)
+        bounds = HamerlyBounds(samples, options.block_size) if options.algorithm == KMeans.Algorithm.HAMERLY else None
+        converged = False
+        for iterations in range(1, options.max_iterations + 1):
+            new_centroid_counts, new_centroids, ids, distances_squared = KMeans.__calculate_centroids(samples, centroids, options.block_size, bounds)
+
+            # Now check if there are any empty clusters (centroids without assigned samples). If so, move them onto the farthest samples.
+            # The farthest samples are picked with exact distances. The distances of `HAMERLY` are only upper bounds
+            # and the ones of `LLOYD` have the rounding errors of `util.euclidean_squared_batch()`, so both would pick different samples.
+            if (new_centroid_counts == 0).any():
+                distances_squared = KMeans.__distances_to_assigned(samples, centroids, ids, options.block_size)
+                KMeans.__repair_empty_clusters(samples, centroids, new_centroid_counts, new_centroids, ids, distances_squared)
+
             # Calculate new centroids by dividing the running totals by the number of samples assigned to each cluster.
             new_centroids /= new_centroid_counts.reshape(-1, 1)
+            new_centroids = new_centroids.astype(options.dtype, copy = False)
             centroid_movement = KMeans.__calculate_centroid_movement(centroids, new_centroids)
             centroids = new_centroids
 
             # If the largest movement is smaller than some small value, we can say that we converged to a solution.
-            if centroid_movement.max() <= sensitivity ** 2:
+            if centroid_movement.max() <= options.sensitivity ** 2:
+                converged = True
                 break
         
+        return KMeans.Clustering(centroids, ids, KMeans.__distances_to_assigned(samples, centroids, ids, options.block_size), iterations, converged)
+
+    @staticmethod
+    def __split_cluster(samples, centroids, ids, distances_squared, options, rng):
+        """Returns `centroids` with one more centroid by splitting the cluster with the highest inertia in two, like bisecting K-Means does.
+
+        The cluster is split by clustering only its own samples into 2 clusters `repeat` times (from `options`) and keeping the best split.
+        The split cluster keeps its index and the second half is added at the end.
+
+        `ids` -- A 1-d ndarray with the index into `centroids` of the closest centroid of each sample.\n
+        `distances_squared` -- A 1-d ndarray with the squared distance of each sample to that centroid.
+        """
+        inertias = np.bincount(ids, distances_squared, minlength = centroids.shape[0])
+        split = inertias.argmax()
+        if inertias[split] == 0:
+            # Every sample lies on its centroid, so there is nothing to split. Add a random sample and leave it to the empty cluster handling.
+            return np.concatenate((centroids, samples[rng.randint(samples.shape[0])].reshape(1, *centroids.shape[1:])))
+
+        members = samples[ids == split]
+        best_halves = min((KMeans.__find_stable_centroids(members, 2, options, rng) for _ in range(options.repeat)), key = lambda halves: halves.inertia)
+
+        centroids = np.concatenate((centroids, best_halves.centroids[1:]))
+        centroids[split] = best_halves.centroids[0]
         return centroids
 
     def __init__(self, options, samples):
@@ -150,8 +385,71 @@ class KMeans:
         `options` -- A KMeansOptions instance.\n
         `samples` -- An ndarray with at least 2 dimensions. It contains the samples.
         """
-        self.__options, self.__samples, self.__rng = options, samples, np.random.RandomState(options.seed)
+        self.__options, self.__samples = options, samples
+        # If there is no seed, pick one now so that all random number generators of this instance are derived from the same seed.
+        self.__entropy = np.random.SeedSequence(options.seed).entropy
+        self.__iteration_counts, self.__convergence = [], []
         
+    def __n_jobs(self):
+        return self.__options.n_jobs if self.__options.n_jobs != -1 else os.cpu_count()
+
+    def __rng(self, K, repeat_index):
+        """Returns a new random number generator for repeat number `repeat_index` for `K` clusters. It only depends on the seed, `K` and `repeat_index`."""
+        return np.random.RandomState(np.random.SeedSequence(self.__entropy, spawn_key = (K, repeat_index)).generate_state(1)[0])
+
+    def __restart(self, K, repeat_index):
+        """Runs repeat number `repeat_index` for `K` clusters with its own random number generator and returns its `Clustering`.
+        This only reads from `self` so the repeats can run on several threads at once."""
+        return KMeans.__find_stable_centroids(self.__samples, K, self.__options, self.__rng(K, repeat_index))
+
+    def __cluster_each(self, Ks):
+        """Clusters the samples into each K in `Ks`. All repeats for all values of K are spread over `n_jobs` threads.
+
+        Returns a list with for each K the `Clustering` with the lowest inertia, the number of iterations of each repeat and whether each repeat converged."""
+        tasks = [(K, repeat_index) for K in Ks for repeat_index in range(self.__options.repeat)]
+        n_jobs = min(self.__n_jobs(), len(tasks))
+        if n_jobs <= 1:
+            results = [self.__restart(K, repeat_index) for K, repeat_index in tasks]
+        else:
+            with ThreadPoolExecutor(n_jobs) as pool:
+                results = list(pool.map(lambda task: self.__restart(*task), tasks))
+
+        clusterings = []
+        for K_results in zip(*[iter(results)] * self.__options.repeat):
+            # Pick the first of the repeats with the lowest distance, like a sequential search would.
+            best_clustering = min(K_results, key = lambda clustering: clustering.inertia)
+            clusterings.append((best_clustering, [clustering.iterations for clustering in K_results], [clustering.converged for clustering in K_results]))
+        return clusterings
+
+    def __warm_sweep_K(self, max_K):
+        """Yields each K from 1 up to and including `max_K` together with its total intra-cluster distance.
+
+        Only K = 1 is clustered from scratch. The clustering for each next K starts from the centroids of the previous K
+        where the cluster with the highest inertia is split in two. The assignments and distances of the final iteration
+        of the previous K are reused to find and split that cluster. The centroids barely move after a split, so each K needs only a few iterations."""
+        samples, options = self.__samples, self.__options
+        centroids = None
+        for K in range(1, max_K + 1):
+            rng = self.__rng(K, 0)
+            if centroids is not None:
+                centroids = KMeans.__split_cluster(samples, centroids, ids, distances_squared, options, rng)
+            clustering = KMeans.__find_stable_centroids(samples, K, options, rng, centroids)
+            centroids, ids, distances_squared = clustering.centroids, clustering.ids, clustering.distances_squared
+            yield K, clustering.inertia
+
+    def __sweep_K(self, max_K):
+        """Yields each K from 1 up to and including `max_K` together with its lowest total intra-cluster distance.
+        If `parallel_K` is `True`, the next `n_jobs` values of K are clustered at the same time."""
+        if self.__options.warm_start:
+            yield from self.__warm_sweep_K(max_K)
+            return
+
+        wave_size = max(1, self.__n_jobs()) if self.__options.parallel_K else 1
+        for wave_start in range(1, max_K + 1, wave_size):
+            Ks = range(wave_start, min(wave_start + wave_size, max_K + 1))
+            for K, (clustering, _, _) in zip(Ks, self.__cluster_each(Ks)):
+                yield K, clustering.inertia
+
     def determine_best_K(self):
         """Determine the best K to use from 1 up to and including `max_K`.
         
@@ -169,8 +467,7 @@ class KMeans:
             print('max_K < 4. Best K: {}'.format(max_K))
             return max_K
 
-        for K in range(1, max_K + 1):
-            _, distance = self.cluster(K)
+        for K, distance in self.__sweep_K(max_K):
 
             # Shift all elements one to the left (erasing the first one in the process)
             K_dists[:-1] = K_dists[1:]
@@ -188,34 +485,42 @@ class KMeans:
             
         return best_K
 
+    @staticmethod
+    def cluster_stream(batches, K, options):
+        """Clusters a stream of batches of samples into K clusters with the mini-batch K-Means algorithm, whatever the `algorithm` in `options` is.
+        Only one batch is in memory at a time, so this works for any number of samples. For example, use `importData.import_unlabeled_chunks()` to stream a file.
+
+        `batches` -- An iterable of ndarrays of samples. The batches should be in random order and the first must have at least `K` samples.\n
+        `K` -- The number of clusters to find.\n
+        `options` -- A KMeansOptions instance.
+
+        Returns an ndarray with the centroids for each cluster.
+        """
+        centroids, _, _ = KMeans.__find_mini_batch_centroids(iter(batches), K, options, np.random.RandomState(options.seed))
+        return centroids
+
     def determine_cluster_ids(self, centroids):
         """Returns a 1 dimensional ndarray with cluster id's for each sample.
 
         The id's are an index into `centroids` for each sample indicating the centroid that is closest to it."""
-        samples = self.__samples
-        ids = np.empty(samples.shape[0], dtype = np.int)
-        for i, sample in zip(range(samples.shape[0]), samples):
-            ids[i], _ = KMeans.__get_closest_centroid_index_and_distance(sample, centroids)
-        
-        return ids
+        return KMeansModel(centroids, block_size = self.__options.block_size).predict(self.__samples)
+
+    def get_iteration_counts(self):
+        """Returns a list with the number of iterations (or batches for `MINI_BATCH`) that each repeat of the last call to `cluster()` needed to converge."""
+        return list(self.__iteration_counts)
+
+    def get_convergence(self):
+        """Returns a list with whether each repeat of the last call to `cluster()` converged. A repeat that did not converge
+        stopped after `max_iterations` iterations (or `max_batches` batches for `MINI_BATCH`)."""
+        return list(self.__convergence)
 
     def cluster(self, K):
-        """Clusters the training samples into K clusters. The algorithm first calculates the best K. 
+        """Clusters the training samples into K clusters. The algorithm first calculates the best K. The repeats run on `n_jobs` threads.
 
         `K` -- The number of clusters to find.
         
-        Returns an ndarray with the centroids for each cluster. Also returns the total intra-cluster distance.
+        Returns the `Clustering` of the repeat with the lowest total intra-cluster distance. It also holds the cluster id of each sample,
+        so there is no need to call `determine_cluster_ids()` for it.
         """
-        samples = self.__samples
-        repeat = self.__options.repeat
-        sensitivity = self.__options.sensitivity
-
-        lowest_distance = float('inf')
-        best_centroids = None
-        for _ in range(repeat):
-            centroids = KMeans.__find_stable_centroids(samples, K, sensitivity, self.__rng)
-            distance = KMeans.__calculate_intra_distance(samples, centroids)
-            if distance < lowest_distance:
-                lowest_distance, best_centroids = distance, centroids
-
-        return best_centroids, lowest_distance
\ No newline at end of file
+        (best_clustering, self.__iteration_counts, self.__convergence), = self.__cluster_each([K])
+        return best_clustering
\ No newline at end of file
@@ -0,0 +1,85 @@
+import utility as util
+import numpy as np
+
+class HamerlyBounds:
+    """Assigns samples to their closest centroid like `KMeans.__assign()` but skips most of the distance calculations in later iterations (Hamerly's algorithm).
+
+    For each sample it keeps an upper bound on the distance to its assigned centroid and a lower bound on the distance to any other centroid.
+    When the centroids move, the bounds are loosened by how far the centroids moved. A sample cannot change clusters while its upper bound
+    is below both its lower bound and half the distance from its centroid to the nearest other centroid, so its distances are not calculated.
+
+    The bounds are loosened by a margin for the rounding errors of the distance calculations, so every sample is assigned
+    to exactly the same centroid as a full assignment would.
+    """
+
+    @staticmethod
+    def __bounds_hold(upper, bound, tolerance):
+        """Returns where the distance to the assigned centroid (at most `upper`) is far enough below the distance to any other centroid (at least about `bound`)
+        for a full assignment to pick the assigned centroid despite rounding errors of up to `tolerance` in the squared distances."""
+        # An infinite `upper` (nothing is known yet) with a zero `bound` (two centroids on the same spot) gives NaN, which correctly does not hold.
+        with np.errstate(invalid = 'ignore'):
+            return (bound - upper) * bound > tolerance
+
+    def __init__(self, samples, block_size):
+        """
+        `samples` -- An ndarray of samples. Must be an ndarray. The same samples must be used for every call to `assign()`.\n
+        `block_size` -- The maximum number of distances that are calculated at once.
+        """
+        self.__samples = samples.reshape(samples.shape[0], -1)
+        self.__norms = (self.__samples.astype(np.float64) ** 2).sum(axis = 1)
+        self.__block_size = block_size
+        self.__centroids = None
+        self.__ids = np.zeros(samples.shape[0], dtype = np.intp)
+        self.__upper = np.full(samples.shape[0], np.inf)
+        self.__lower = np.zeros(samples.shape[0])
+
+    def assign(self, centroids):
+        """Returns a 1-d ndarray with the index into `centroids` of the closest centroid of each sample.
+        The bounds are updated for the movement of the centroids since the previous call."""
+        centroids = centroids.reshape(centroids.shape[0], -1)
+
+        # The bounds are kept in `np.float64`, whatever the type of the centroids is.
+        # An upper bound on the rounding error of the squared distances of each sample that are calculated with `util.euclidean_squared_batch()`
+        # in the floating point type of the centroids.
+        float_centroids = centroids.astype(np.float64)
+        tolerance = 16 * np.finfo(centroids.dtype).eps * (self.__norms + (float_centroids ** 2).sum(axis = 1).max())
+
+        if self.__centroids is not None:
+            movement = np.sqrt(((float_centroids - self.__centroids) ** 2).sum(axis = 1))
+            self.__upper += movement[self.__ids]
+            self.__lower -= movement.max()
+        self.__centroids = float_centroids
+
+        if centroids.shape[0] == 1:
+            self.__ids[:] = 0
+            return self.__ids.copy()
+
+        # Half the distance from each centroid to its nearest other centroid.
+        centroid_distances = np.sqrt(((float_centroids[:, np.newaxis] - float_centroids[np.newaxis]) ** 2).sum(axis = 2))
+        np.fill_diagonal(centroid_distances, np.inf)
+        half_separation = 0.5 * centroid_distances.min(axis = 1)
+
+        bound = np.maximum(half_separation[self.__ids], self.__lower)
+        candidates = np.nonzero(~HamerlyBounds.__bounds_hold(self.__upper, bound, tolerance))[0]
+
+        # Tighten the upper bound of the candidates to their exact distance and check again.
+        difference = self.__samples[candidates] - float_centroids[self.__ids[candidates]]
+        self.__upper[candidates] = np.sqrt((difference ** 2).sum(axis = 1))
+        candidates = candidates[~HamerlyBounds.__bounds_hold(self.__upper[candidates], bound[candidates], tolerance[candidates])]
+
+        # Calculate all distances for the remaining candidates, exactly like a full assignment would.
+        chunk_size = max(1, self.__block_size // centroids.shape[0])
+        for start in range(0, candidates.shape[0], chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            block = util.euclidean_squared_batch(self.__samples[chunk], centroids)
+            self.__ids[chunk] = block.argmin(axis = 1)
+            nearest_two = np.partition(block, 1, axis = 1)
+            self.__upper[chunk] = np.sqrt(nearest_two[:, 0] + tolerance[chunk])
+            self.__lower[chunk] = np.sqrt(np.maximum(nearest_two[:, 1] - tolerance[chunk], 0))
+
+        return self.__ids.copy()
+
+    def distances_squared(self):
+        """Returns a 1-d ndarray with an upper bound on the squared distance of each sample to the centroid that it was assigned to by the last call to `assign()`.
+        The bound is exact for the samples whose distances were calculated in that call."""
+        return self.__upper ** 2
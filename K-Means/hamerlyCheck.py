@@ -0,0 +1,20 @@
+from KMeans import KMeans
+
+import numpy as np
+
+# Checks that `HAMERLY` finds exactly the same clustering as `LLOYD` for the same seed. The samples are small rounded numbers,
+# so many samples share a spot and clusters often become empty, which tests the repair of empty clusters as well.
+datasets = 300
+differences = 0
+for seed in range(datasets):
+    rng = np.random.RandomState(seed)
+    sample_count, dimensions, K = rng.randint(20, 120), rng.randint(1, 4), rng.randint(2, 16)
+    samples = np.round(rng.standard_t(2, size = (sample_count, dimensions)))
+    for dtype in (np.float64, np.float32):
+        clusterings = [KMeans(KMeans.KMeansOptions(K, 0.0, 1, seed, algorithm = algorithm, dtype = dtype), samples).cluster(K) \
+            for algorithm in (KMeans.Algorithm.LLOYD, KMeans.Algorithm.HAMERLY)]
+        if not (np.array_equal(clusterings[0].centroids, clusterings[1].centroids) and np.array_equal(clusterings[0].ids, clusterings[1].ids)):
+            differences += 1
+            print('Seed {} with {}: LLOYD inertia {:0.2f}, HAMERLY inertia {:0.2f}'.format(seed, np.dtype(dtype).name, clusterings[0].inertia, clusterings[1].inertia))
+
+print('{} of {} clusterings differ.'.format(differences, 2 * datasets))
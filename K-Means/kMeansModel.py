@@ -0,0 +1,65 @@
+import utility as util
+import numpy as np
+
+class KMeansModel:
+    """A clustering that was found by `KMeans`, without the samples it was found with. It assigns new samples to the learned centroids.
+
+    The model only holds the centroids (and optionally a label for each cluster), so it can be saved to a small binary file
+    and loaded by another process that labels new samples without clustering again.
+    """
+
+    def __init__(self, centroids, cluster_labels = None, block_size = 2 ** 22):
+        """
+        `centroids` -- An ndarray with the centroids, like `KMeans.Clustering.centroids`.\n
+        `cluster_labels` -- A 1-d ndarray with a label for each cluster or `None`. (Default = `None`)\n
+        `block_size` -- The maximum number of sample-to-centroid distances that are calculated at once. This bounds the peak memory use. (Default = `2 ** 22`)
+        """
+        if cluster_labels is not None and len(cluster_labels) != centroids.shape[0]:
+            raise Exception('There must be one label for each of the {} clusters, but there are {}.'.format(centroids.shape[0], len(cluster_labels)))
+        self.centroids = centroids
+        self.cluster_labels = np.asarray(cluster_labels) if cluster_labels is not None else None
+        self.__block_size = block_size
+
+    def __distance_blocks(self, samples):
+        """Yields the start index of each block of `samples` and the squared distances from the samples in that block to all centroids."""
+        samples = samples.reshape(samples.shape[0], -1)
+        centroids = self.centroids.reshape(self.centroids.shape[0], -1)
+        chunk_size = max(1, self.__block_size // centroids.shape[0])
+        for start in range(0, samples.shape[0], chunk_size):
+            yield start, util.euclidean_squared_batch(samples[start:start + chunk_size], centroids)
+
+    def predict(self, samples):
+        """Returns a 1-d ndarray with the index of the closest centroid of each of the `samples`."""
+        ids = np.empty(samples.shape[0], dtype = np.intp)
+        for start, block in self.__distance_blocks(samples):
+            ids[start:start + block.shape[0]] = block.argmin(axis = 1)
+
+        return ids
+
+    def predict_labels(self, samples):
+        """Returns a 1-d ndarray with the label of the cluster of each of the `samples`."""
+        if self.cluster_labels is None:
+            raise Exception('The model has no cluster labels.')
+        return self.cluster_labels[self.predict(samples)]
+
+    def transform(self, samples):
+        """Returns a 2-d ndarray of shape `[samples.shape[0], K]` with the (not squared) euclidean distance from each of the `samples` to each centroid."""
+        distances = np.empty((samples.shape[0], self.centroids.shape[0]))
+        for start, block in self.__distance_blocks(samples):
+            np.sqrt(block, out = distances[start:start + block.shape[0]])
+
+        return distances
+
+    def save(self, path):
+        """Saves the centroids and cluster labels to a binary `.npz` file at `path`."""
+        arrays = {'centroids': self.centroids}
+        if self.cluster_labels is not None:
+            arrays['cluster_labels'] = self.cluster_labels
+        with open(path, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+
+    @staticmethod
+    def load(path, block_size = 2 ** 22):
+        """Returns the `KMeansModel` that was saved to the file at `path` with `save()`."""
+        with np.load(path, allow_pickle = False) as arrays:
+            return KMeansModel(arrays['centroids'], arrays['cluster_labels'] if 'cluster_labels' in arrays else None, block_size)
@@ -0,0 +1,14 @@
+from importData import import_unlabeled
+from kMeansModel import KMeansModel
+
+import sys
+
+# Labels days with a model that was saved by main.py, without clustering again.
+# Usage: python labelDays.py <model path> [<days path>]
+if len(sys.argv) < 2:
+    print('Usage: python labelDays.py <model path> [<days path>]')
+    sys.exit(1)
+
+model = KMeansModel.load(sys.argv[1])
+samples = import_unlabeled(sys.argv[2] if len(sys.argv) > 2 else '..\\days.csv')
+print('Labels for the days: {}'.format(model.predict_labels(samples)))
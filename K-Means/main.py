@@ -1,7 +1,9 @@
 from importData import import_training_data, import_validation_data, import_unlabeled
 from KMeans import KMeans
+import utility as util
 
 import numpy as np
+import sys
 
 # Import the training data, validation data, and the unlabeled data
 training_labels, training_samples = import_training_data('..\\dataset1.csv')
@@ -11,26 +13,27 @@ K_means_option = KMeans.KMeansOptions(15, 0.01, 10, None)
 k_means = KMeans(K_means_option, training_samples)
 best_K = k_means.determine_best_K()
 print('Best K: {}\nYou can copy paste the printed distances above for each K into excel to visualise the scree plot.'.format(best_K))
-centroids, _ = k_means.cluster(best_K)
-cluster_ids = k_means.determine_cluster_ids(centroids)
+clustering = k_means.cluster(best_K)
+centroids, cluster_ids = clustering.centroids, clustering.ids
 
 # Op basis van de screeplot zou ik zeggen dat de beste K 2 of 3 moet zijn. Het is niet helemaal duidelijk. Het algoritme vindt vaak andere K's.
 
 print('centroids:\n{}\ncluster_ids:\n{}'.format(centroids, cluster_ids))
 
 # Now figure out what labels are most common in each cluster
-unique_training_labels = np.unique(training_labels)
-cluster_label_counts = np.zeros((centroids.shape[0], unique_training_labels.shape[0]), dtype='i')
-
-for cluster_id, correct_label in zip(cluster_ids, training_labels):
-    cluster_label_counts[cluster_id][np.nonzero(unique_training_labels == correct_label)] += 1
-
+unique_training_labels, cluster_label_counts = util.cluster_label_counts(cluster_ids, training_labels, centroids.shape[0])
 labels_for_cluster_ids = unique_training_labels[np.argmax(cluster_label_counts, axis=1)]
 
 # Calculate the percentage of samples who's original label equals the label of its cluster
-correct_count = 0
-for cluster_id, correct_label in zip(cluster_ids, training_labels):
-    if(labels_for_cluster_ids[cluster_id] == correct_label):
-        correct_count += 1
+correct_count = np.count_nonzero(labels_for_cluster_ids[cluster_ids] == training_labels)
+
+print('Correctly labeled: {} (is {}%)\nLabels for cluster ids: {}'.format(correct_count, 100 * correct_count / training_labels.shape[0], labels_for_cluster_ids))
+
+# Label the unlabeled days with the centroids and the label of each cluster.
+model = clustering.to_model(labels_for_cluster_ids)
+print('Labels for the unlabeled days: {}'.format(model.predict_labels(labeled_samples)))
 
-print('Correctly labeled: {} (is {}%)\nLabels for cluster ids: {}'.format(correct_count, 100 * correct_count / training_labels.shape[0], labels_for_cluster_ids))
\ No newline at end of file
+# If a path is given (like `python main.py seasons.model.npz`), save the model so that new days can be labeled without clustering again. See labelDays.py.
+if len(sys.argv) > 1:
+    model.save(sys.argv[1])
+    print('Saved the model to {}'.format(sys.argv[1]))
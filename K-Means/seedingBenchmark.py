@@ -0,0 +1,22 @@
+from importData import import_training_data
+from KMeans import KMeans
+
+import numpy as np
+import time
+
+# Compares how the start locations of the centroids affect the number of iterations until convergence, the time that `cluster()` takes
+# and the total intra-cluster distance that it finds. Every initialization uses the same seeds.
+training_labels, training_samples = import_training_data('..\\dataset1.csv')
+
+repeat = 10
+initializations = (KMeans.Initialization.RANDOM, KMeans.Initialization.K_MEANS_PLUS_PLUS, KMeans.Initialization.K_MEANS_PARALLEL)
+
+print('K;initialization;mean iterations;ms;distance')
+for K in (2, 4, 8, 15):
+    for initialization in initializations:
+        options = KMeans.KMeansOptions(15, 0.01, repeat, 0, initialization = initialization)
+        k_means = KMeans(options, training_samples)
+        start = time.perf_counter()
+        distance = k_means.cluster(K).inertia
+        seconds = time.perf_counter() - start
+        print('{};{};{:0.1f};{:0.1f};{:0.0f}'.format(K, initialization.name, np.mean(k_means.get_iteration_counts()), 1000 * seconds, distance))
@@ -6,6 +6,20 @@ def euclidean_squared(sample1, sample2, weights = None):
         return (((sample1 - sample2) * weights) ** 2).sum()
     return ((sample1 - sample2) ** 2).sum()
 
+def euclidean_squared_batch(samples, centroids):
+    """Returns a 2-d ndarray with the `euclidean_squared()` distance from each sample in `samples` to each centroid in `centroids`.
+    Element `[i, j]` is the distance from `samples[i]` to `centroids[j]`.
+
+    The distances are calculated as `|x|^2 - 2 x . c + |c|^2` so the bulk of the work is a single matrix product.
+    Rounding can make this expansion slightly negative for samples that lie on a centroid, so the result is clipped at 0.
+    The calculations are done in the floating point type of `centroids` (`np.float64` if they hold integers) and the `samples` are converted to it."""
+    dtype = centroids.dtype if np.issubdtype(centroids.dtype, np.floating) else np.float64
+    samples, centroids = samples.astype(dtype, copy = False), centroids.astype(dtype, copy = False)
+    distances = samples @ (-2 * centroids.T)
+    distances += (samples ** 2).sum(axis = 1).reshape(-1, 1)
+    distances += (centroids ** 2).sum(axis = 1)
+    return np.maximum(distances, 0, out = distances)
+
 def minkowski_squared(sample1, sample2, weights = None, P = 2):
     if weights is not None:
         return ((np.fabs(sample1 - sample2) * weights) ** P).sum()
@@ -24,4 +38,15 @@ def weighted_majority_vote(neighbour_labels, neighbour_distances_squared):
     for i in range(neighbour_labels.shape[0]):
         label_votes[neighbour_labels[i]] += neighbour_votes[i]
 
-    return max(label_votes, key = label_votes.get)
\ No newline at end of file
+    return max(label_votes, key = label_votes.get)
+
+def cluster_label_counts(cluster_ids, labels, cluster_count):
+    """Returns the unique `labels` and a 2-d ndarray of shape `[cluster_count, unique labels]` with the number of samples of each cluster that have each label.
+
+    `cluster_ids` -- A 1-d ndarray with the cluster id of each sample.\n
+    `labels` -- A 1-d ndarray with the label of each sample.\n
+    `cluster_count` -- The number of clusters.
+    """
+    unique_labels, label_codes = np.unique(labels, return_inverse = True)
+    counts = np.bincount(cluster_ids * unique_labels.shape[0] + label_codes, minlength = cluster_count * unique_labels.shape[0])
+    return unique_labels, counts.reshape(cluster_count, unique_labels.shape[0])
@@ -2,6 +2,11 @@ import utility as util
 import numpy as np
 import itertools as it
 from enum import Enum
+from invertedFileIndex import InvertedFileIndex
+from sklearn.neighbors import KDTree, BallTree
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
 
 class KNN:
     """Implements the K-nearest-neighbours algorithm.
@@ -12,48 +17,169 @@ class KNN:
     Manually invoking `determine_best_K()` determines the success rate of each K from 1 up to and including `max_K` and selects the best K to use.
     `predict()` can be called multiple times after calling `determine_best_K()`.
     
-    For convenience, instances of this class maintain references to the training labels and samples that were passed to the constructor.
+    For convenience, instances of this class maintain the training labels and samples that were passed to the constructor.
+    `add_samples()` and `remove_samples()` change the training samples afterwards without starting over.
 
     The algorithm used the Minkowski distance and supports specifying weights for each dimension in the input data.
+
+    By default the neighbours are found by calculating the distance to every training sample. Optionally, a KD-tree or a ball tree can be built
+    over the training samples once in the constructor, which finds the exact same neighbours much faster for low dimensional data.
+    For large sets of training samples, an inverted file index finds approximate neighbours even faster. Use `measure_recall()` to tune it.
     """
 
     class NeighbourWeightingStrategy(Enum):
         MAJORITY_VOTE = 1
         WEIGHTED_MAJORITY_VOTE = 2
 
+    class SearchStrategy(Enum):
+        BRUTE_FORCE = 1
+        KD_TREE = 2
+        BALL_TREE = 3
+        INVERTED_FILE = 4
+
     class KNNOptions:
         """Configures the KNN algorithm."""
 
-        def __init__(self, max_K, P, weights, neighbour_weighting_strategy):
+        def __init__(self, max_K, P, weights, neighbour_weighting_strategy, block_size = 2 ** 22, search_strategy = None, \
+            list_count = None, probe_count = 1, seed = None, n_jobs = 1, rebuild_fraction = 0.25, dtype = None):
             """
             `max_K` -- The maximum value for K that `determine_best_K()` will try.\n
             `P` -- The power parameter for the Minkowski distance algorithm.\n
             `weights` -- A NumPy ndarray of numbers with shape `[n]` where `n` equal to the number of elements in a sample.
             These can be used to scale the contribution each dimension of the input samples during the calculation of the distance between samples.\n
-            `neighbour_weighting_strategy` -- A member of `NeighbourWeightingStrategy` indicating how neighbours of samples should be weighted during label prediction.
+            `neighbour_weighting_strategy` -- A member of `NeighbourWeightingStrategy` indicating how neighbours of samples should be weighted during label prediction.\n
+            `block_size` -- The maximum number of distances that are calculated at once. The samples are split into chunks
+            so that a block of (chunk size x training sample count) distances never exceeds this. This bounds the peak memory use. (Default = `2 ** 22`)\n
+            `search_strategy` -- A member of `SearchStrategy` indicating how the nearest neighbours are found. `KD_TREE` is best for samples with few dimensions,
+            `BALL_TREE` copes better with more dimensions. Both require `P` >= 1. `INVERTED_FILE` is approximate: it may miss some of the nearest neighbours.
+            If `None`, uses `BRUTE_FORCE`. (Default = `None`)\n
+            `list_count` -- The number of inverted lists (K-Means clusters) of the `INVERTED_FILE` index. If `None`, uses the square root of the number of training samples. (Default = `None`)\n
+            `probe_count` -- The number of inverted lists that the `INVERTED_FILE` index searches for each sample. Higher is more accurate but slower. (Default = `1`)\n
+            `seed` -- The seed for the clustering of the `INVERTED_FILE` index. (Default = `None`)\n
+            `n_jobs` -- The number of threads that search for neighbours at the same time. Each thread searches an equal share of the samples.
+            The threads share the training samples and the index without copying them. If `-1`, uses one thread per CPU core. (Default = `1`)\n
+            `rebuild_fraction` -- Samples added with `add_samples()` are not put in the index but searched by brute force next to it,
+            and samples removed with `remove_samples()` are skipped. The index is rebuilt once the added and removed samples
+            together exceed this fraction of the indexed samples. (Default = `0.25`)\n
+            `dtype` -- The NumPy type that the training samples and the samples to predict are converted to, or `None` to use them as they are.
+            With `np.float32` the brute force distances are calculated on half the memory and are about as accurate. With an integer type like `np.int32`
+            (for samples that only hold whole numbers, see `importData`), no `weights` and a whole number `P`, the brute force distances are exact.
+            With an integer type, samples that are not all whole numbers raise an exception instead of being cut off.
+            The spatial indexes of scikit-learn always calculate in `np.float64`. (Default = `None`)
             """
             self.max_K, self.P = max_K, P
             self.weights, self.neighbour_weighting_strategy = weights, neighbour_weighting_strategy
+            self.block_size = block_size
+            self.search_strategy = search_strategy if search_strategy is not None else KNN.SearchStrategy.BRUTE_FORCE
+            self.list_count, self.probe_count, self.seed = list_count, probe_count, seed
+            self.n_jobs, self.rebuild_fraction = n_jobs, rebuild_fraction
+            self.dtype = dtype
+
+    @staticmethod
+    def __brute_force_neighbours(samples, K, weights, P, training_samples, block_size, sort):
+        """Returns the indices of the `K` nearest training samples of each sample and the distances to them as two ndarrays of shape `[samples.shape[0], K]`.
+        If `sort` is `True`, the neighbours of each sample are sorted from nearest to farthest."""
+        neighbour_indices = np.empty((samples.shape[0], K), dtype = np.intp)
+        neighbour_distances_squared = np.empty((samples.shape[0], K))
+        chunk_size = max(1, block_size // training_samples.shape[0])
+        for start in range(0, samples.shape[0], chunk_size):
+            # Calculate the Minkowski distances from each sample in the chunk to each training sample as one [chunk size, training sample count] block.
+            distances_squared = util.minkowski_squared_batch(samples[start:start + chunk_size], training_samples, weights, P)
+
+            # Calculate the indices of the K nearest neighbours by partitioning each row of our distances block using K-1 as the pivot.
+            # Then use the indices to look up the corresponding distances.
+            chunk_indices = np.argpartition(distances_squared, K-1, axis = 1)[:, :K]
+            chunk_distances_squared = np.take_along_axis(distances_squared, chunk_indices, axis = 1)
+            if sort:
+                order = np.argsort(chunk_distances_squared, axis = 1, kind = 'stable')
+                chunk_indices = np.take_along_axis(chunk_indices, order, axis = 1)
+                chunk_distances_squared = np.take_along_axis(chunk_distances_squared, order, axis = 1)
+            neighbour_indices[start:start + chunk_size] = chunk_indices
+            neighbour_distances_squared[start:start + chunk_size] = chunk_distances_squared
+
+        return neighbour_indices, neighbour_distances_squared
+
+    @staticmethod
+    def __build_index(options, training_samples):
+        """Builds and returns the spatial index for the search strategy in `options` over the `training_samples` or `None` for `BRUTE_FORCE`.
+
+        The weights are applied by scaling the training samples up front. This gives the same distances since `(|a - b| * w) ^ P` equals `|a * w - b * w| ^ P`.
+        """
+        search_strategy, P = options.search_strategy, options.P
+        if search_strategy == KNN.SearchStrategy.BRUTE_FORCE:
+            return None
+
+        # The index has to keep its own copy since `remove_samples()` overwrites the training samples.
+        scaled_samples = KNN.__scale(training_samples, options.weights)
+        if np.shares_memory(scaled_samples, training_samples):
+            scaled_samples = scaled_samples.copy()
+        if search_strategy == KNN.SearchStrategy.INVERTED_FILE:
+            return InvertedFileIndex(scaled_samples, P, options.list_count, options.probe_count, options.seed, options.block_size)
+
+        if P < 1:
+            raise Exception('A {} requires P >= 1 but P is {}.'.format(search_strategy.name, P))
+        if search_strategy == KNN.SearchStrategy.KD_TREE:
+            return KDTree(scaled_samples, metric = 'minkowski', p = P)
+        return BallTree(scaled_samples, metric = 'minkowski', p = P)
+
+    @staticmethod
+    def __scale(samples, weights):
+        samples = samples.reshape(samples.shape[0], -1)
+        if weights is not None:
+            return samples * np.fabs(weights.reshape(-1))
+        return samples
+
+    @staticmethod
+    def __as_dtype(samples, dtype):
+        """Returns `samples` converted to `dtype`, or `samples` as they are if `dtype` is `None`.
+        Raises an exception if `dtype` is an integer type and not all values are whole numbers, since they would be cut off (like `importData` does)."""
+        if dtype is None:
+            return samples
+        if np.issubdtype(dtype, np.integer) and not (samples == np.round(samples)).all():
+            raise Exception('Not all values of the samples are whole numbers, so they cannot be converted to {}. Use a floating point dtype instead.'.format(np.dtype(dtype).name))
+        return samples.astype(dtype, copy = False)
 
     @staticmethod
-    def __predict(samples, K, weights, P, training_labels, training_samples, neighbour_weighting_func):
-        labels = []
-        for sample in samples:
-            # Calculate the Minkowski distances from sample to each training sample and store the results in an array
-            distances_squared = np.empty(training_samples.shape[0])
-            for distance, training_sample in zip(np.nditer(distances_squared, op_flags=['writeonly']), training_samples):
-                distance[...] = util.minkowski_squared(sample, training_sample, weights, P)
+    def __vote(neighbour_codes, neighbour_distances_squared, unique_labels, neighbour_weighting_func):
+        """Counts the label codes of the neighbours of all samples at once, takes the most common label of each sample, and returns them as a 1 dimensional NumPy array."""
+        return unique_labels[neighbour_weighting_func(neighbour_codes, unique_labels.shape[0], neighbour_distances_squared)]
 
-            # Calculate the indices of the K nearest neighbours by partitioning our distances array using K-1 as the pivot.
-            # Then use the indices to look up the corresponding labels and distances.
-            neighbour_indices = np.argpartition(distances_squared, K-1)[:K]
-            neighbour_labels = training_labels[neighbour_indices]
-            neighbour_distances_squared = distances_squared[neighbour_indices]
+    @staticmethod
+    def __encode(labels):
+        """Returns the unique labels and a 1-d ndarray with the integer code of each of the `labels`. `unique_labels[codes]` decodes the codes again."""
+        unique_labels, codes = np.unique(labels, return_inverse = True)
+        return unique_labels, codes.reshape(-1)
+
+    @staticmethod
+    def __sweep_K(neighbour_codes, neighbour_distances_squared, unique_labels, neighbour_weighting_strategy):
+        """Predicts the labels of samples for every K from 1 up to and including `max_K` while searching for the neighbours only once.
+
+        `neighbour_codes` and `neighbour_distances_squared` must contain the label codes of and distances to the `max_K` nearest neighbours of each sample,
+        sorted from nearest to farthest. `unique_labels` decodes the label codes.
+        The votes for each label are accumulated one neighbour at a time,
+        so the labels for K follow from the votes for K-1 plus the votes of the K-th nearest neighbours.
+        Ties are won by the label with the nearest neighbour, like `majority_vote()` and `weighted_majority_vote()` do for sorted neighbours.
 
-            # Count each label, take the most common label, and append it to the labels array as a result.
-            labels.append(neighbour_weighting_func(neighbour_labels, neighbour_distances_squared))
+        Yields K and the predicted labels for that K as a 1 dimensional NumPy array.
+        """
+        samples_count, max_K = neighbour_codes.shape
+
+        if neighbour_weighting_strategy == KNN.NeighbourWeightingStrategy.WEIGHTED_MAJORITY_VOTE:
+            neighbour_votes = 1.0 / (neighbour_distances_squared ** 0.5)
+        else:
+            neighbour_votes = np.ones(neighbour_distances_squared.shape)
 
-        return np.array(labels)
+        rows = np.arange(samples_count)
+        votes = np.zeros((samples_count, unique_labels.shape[0]))
+        nearest_ranks = np.full(votes.shape, max_K)
+        for K in range(1, max_K + 1):
+            codes = neighbour_codes[:, K-1]
+            votes[rows, codes] += neighbour_votes[:, K-1]
+            nearest_ranks[rows, codes] = np.minimum(nearest_ranks[rows, codes], K-1)
+
+            # Of the labels with the most votes, pick the one that has the nearest neighbour.
+            winners = np.where(votes == votes.max(axis = 1, keepdims = True), nearest_ranks, max_K).argmin(axis = 1)
+            yield K, unique_labels[winners]
 
     def __init__(self, options, training_labels, training_samples):
         """
@@ -61,19 +187,167 @@ class KNN:
         `training_labels` -- A NumPy array of 1 dimension containing the labels for the training samples.\n
         `training_samples` -- A NumPy array with at least 2 dimensions. It contains the training samples.
         """
-        self.__options, self.__training_labels = options, training_labels
-        self.__training_samples, self.__K = training_samples, None
+        self.__options, self.__K = options, None
+        self.__unique_labels, training_codes = KNN.__encode(training_labels)
+        training_samples = KNN.__as_dtype(training_samples, options.dtype)
+
+        # The training samples and their label codes are kept in storage arrays with room to grow. Only the first `__count` rows are in use.
+        # Until the training samples are changed, the storage arrays are the arrays passed to the constructor so that nothing is copied.
+        self.__samples_storage, self.__codes_storage, self.__count = training_samples, training_codes, training_samples.shape[0]
+        self.__position_rows_storage, self.__owns_storage = np.empty(self.__count, dtype = np.intp), False
+        self.__update_views()
+        self.__rebuild_index()
 
         if options.neighbour_weighting_strategy == KNN.NeighbourWeightingStrategy.MAJORITY_VOTE:
-            self.__neighbour_weighting_func = util.majority_vote
+            self.__neighbour_weighting_func = util.majority_vote_batch
         elif options.neighbour_weighting_strategy == KNN.NeighbourWeightingStrategy.WEIGHTED_MAJORITY_VOTE:
-            self.__neighbour_weighting_func = util.weighted_majority_vote
+            self.__neighbour_weighting_func = util.weighted_majority_vote_batch
+
+    def __update_views(self):
+        self.__training_samples = self.__samples_storage[:self.__count]
+        self.__training_codes = self.__codes_storage[:self.__count]
+        self.__position_rows = self.__position_rows_storage[:self.__count]
+
+    def __rebuild_index(self):
+        """Builds the index over all current training samples and resets the bookkeeping of the samples that were added and removed since."""
+        self.__index = KNN.__build_index(self.__options, self.__training_samples)
+
+        # `__index_positions` maps each row of the index to the position of its sample in the training samples (-1 once it is removed).
+        # `__position_rows` maps each position back to its row in the index (-1 for samples that were added after the index was built).
+        self.__index_positions = np.arange(self.__count)
+        self.__position_rows[:] = self.__index_positions
+        self.__added_count, self.__removed_count = 0, 0
+
+    def __reserve(self, count):
+        """Makes sure that the storage arrays are owned by this instance and have room for `count` training samples.
+        The storage grows by doubling its capacity, so adding samples costs amortized O(1) per sample."""
+        capacity = self.__samples_storage.shape[0]
+        if self.__owns_storage and count <= capacity:
+            return
+
+        capacity = max(count, 2 * capacity) if count > capacity else capacity
+        samples_storage = np.empty((capacity,) + self.__samples_storage.shape[1:], dtype = self.__samples_storage.dtype)
+        codes_storage = np.empty(capacity, dtype = self.__codes_storage.dtype)
+        position_rows_storage = np.empty(capacity, dtype = np.intp)
+        samples_storage[:self.__count] = self.__training_samples
+        codes_storage[:self.__count] = self.__training_codes
+        position_rows_storage[:self.__count] = self.__position_rows
+
+        self.__samples_storage, self.__codes_storage, self.__position_rows_storage = samples_storage, codes_storage, position_rows_storage
+        self.__owns_storage = True
+        self.__update_views()
+
+    def __encode_new(self, labels):
+        """Returns a 1-d ndarray with the integer code of each of the `labels`. Labels that were never seen before get a new code."""
+        unique_labels, codes = np.unique(labels, return_inverse = True)
+        known_codes = {label: code for code, label in enumerate(self.__unique_labels)}
+        new_labels = [label for label in unique_labels if label not in known_codes]
+        self.__unique_labels = np.concatenate((self.__unique_labels, new_labels)) if new_labels else self.__unique_labels
+
+        known_codes.update((label, code) for code, label in enumerate(self.__unique_labels))
+        return np.array([known_codes[label] for label in unique_labels], dtype = np.intp)[codes.reshape(-1)]
+
+    def __refresh_index(self):
+        if self.__index is not None and self.__added_count + self.__removed_count > self.__options.rebuild_fraction * self.__index_positions.shape[0]:
+            self.__rebuild_index()
+
+    def __nearest_neighbours(self, samples, K, training_samples, sort):
+        """Returns the indices of the `K` nearest `training_samples` of each sample and the distances to them as two ndarrays of shape `[samples.shape[0], K]`.
+
+        Uses the spatial index if there is one and `training_samples` are the samples passed to the constructor. The neighbours found with the index are always sorted.
+        If `n_jobs` is not `1`, the samples are split into one shard per thread. The distance calculations and the index queries release the GIL
+        so the shards are searched in parallel. The results are put back together in the order of `samples`."""
+        if K > training_samples.shape[0]:
+            raise Exception('Cannot find {} neighbours among {} training samples.'.format(K, training_samples.shape[0]))
+        samples = KNN.__as_dtype(samples, self.__options.dtype)
+        n_jobs = self.__options.n_jobs if self.__options.n_jobs != -1 else os.cpu_count()
+        n_jobs = min(n_jobs, samples.shape[0])
+        if n_jobs <= 1:
+            return self.__search_neighbours(samples, K, training_samples, sort)
+
+        with ThreadPoolExecutor(n_jobs) as pool:
+            results = list(pool.map(lambda shard: self.__search_neighbours(shard, K, training_samples, sort), np.array_split(samples, n_jobs)))
+        return np.concatenate([indices for indices, _ in results]), np.concatenate([distances for _, distances in results])
+
+    def __search_neighbours(self, samples, K, training_samples, sort):
+        options = self.__options
+        if self.__index is None or training_samples is not self.__training_samples:
+            return KNN.__brute_force_neighbours(samples, K, options.weights, options.P, training_samples, options.block_size, sort)
+
+        # The index returns the actual Minkowski distances so raise them to the power P to get the same values as `minkowski_squared()`.
+        # Ask for extra neighbours to make up for the ones that may have been removed.
+        neighbour_distances, neighbour_rows = self.__index.query(KNN.__scale(samples, options.weights), k = min(K + self.__removed_count, self.__index_positions.shape[0]))
+        neighbour_indices = self.__index_positions[neighbour_rows]
+        neighbour_distances_squared = np.where(neighbour_indices >= 0, neighbour_distances ** options.P, np.inf)
+        if self.__added_count == 0 and self.__removed_count == 0:
+            return neighbour_indices, neighbour_distances_squared
+
+        # Search the samples that were added after the index was built by brute force and merge them with the neighbours from the index.
+        added_positions = np.nonzero(self.__position_rows < 0)[0]
+        if added_positions.shape[0] > 0:
+            added_indices, added_distances_squared = KNN.__brute_force_neighbours(samples, min(K, added_positions.shape[0]), \
+                options.weights, options.P, training_samples[added_positions], options.block_size, False)
+            neighbour_indices = np.concatenate((neighbour_indices, added_positions[added_indices]), axis = 1)
+            neighbour_distances_squared = np.concatenate((neighbour_distances_squared, added_distances_squared), axis = 1)
+
+        nearest = np.argsort(neighbour_distances_squared, axis = 1, kind = 'stable')[:, :K]
+        return np.take_along_axis(neighbour_indices, nearest, axis = 1), np.take_along_axis(neighbour_distances_squared, nearest, axis = 1)
+
+    def add_samples(self, labels, samples):
+        """Adds labeled samples to the training samples. Labels that were not seen before are allowed.
+
+        The samples are appended to the storage, which grows by doubling. The index (if any) is not rebuilt for every call.
+        Instead, the added samples are searched by brute force until `rebuild_fraction` is exceeded, so adding samples costs O(added samples) on average.
+
+        `labels` -- A NumPy array of 1 dimension containing the labels for the samples.\n
+        `samples` -- A NumPy array with the same shape as the training data. It contains the samples to add.
+        """
+        samples = KNN.__as_dtype(samples, self.__options.dtype)
+        count = self.__count + samples.shape[0]
+        self.__reserve(count)
+        self.__samples_storage[self.__count:count] = samples
+        self.__codes_storage[self.__count:count] = self.__encode_new(labels)
+        self.__position_rows_storage[self.__count:count] = -1
+        self.__count, self.__added_count = count, self.__added_count + samples.shape[0]
+        self.__update_views()
+        self.__refresh_index()
+
+    def remove_samples(self, indices):
+        """Removes the training samples at positions `indices` from the training samples.
+
+        To keep this O(removed samples), the freed positions are filled with the last training samples.
+        So this changes the positions of at most `len(indices)` of the remaining training samples.
+
+        `indices` -- An array of positions of the training samples to remove.
+        """
+        self.__reserve(self.__count)
+        for position in np.unique(indices)[::-1]:
+            last = self.__count - 1
+            row = self.__position_rows[position]
+            if row >= 0:
+                self.__index_positions[row] = -1
+                self.__removed_count += 1
+            else:
+                self.__added_count -= 1
+
+            if position != last:
+                # Move the last sample into the freed position.
+                self.__samples_storage[position] = self.__samples_storage[last]
+                self.__codes_storage[position] = self.__codes_storage[last]
+                moved_row = self.__position_rows_storage[position] = self.__position_rows_storage[last]
+                if moved_row >= 0:
+                    self.__index_positions[moved_row] = position
+            self.__count -= 1
+
+        self.__update_views()
+        self.__refresh_index()
 
     def determine_best_K(self, validation_labels, validation_samples):
-        """Determine the best K to use according to its performance. This can take a long time!
+        """Determine the best K to use according to its performance.
 
         Calculates the performance (# of correctly guessed labels of the validation samples) of each K from 1 up to and including `max_K` (which was specified in the options object).
         Then selects and stores the best value for K. It will be used for all subsequent calls to `predict()`.
+        The nearest neighbours are only searched for once for all K, so this costs about as much as a single call to `predict()`.
 
         `validation_labels` -- An array of strings containing the labels of the validation sample.\n
         `validation_samples` -- A NumPy array with the same shape as the training data. It contains the validation samples that the algorithm is going to guess the labels for.\n
@@ -82,14 +356,9 @@ class KNN:
 
         best_K = 0
         best_performance = 0
-        for K in range(1, self.__options.max_K + 1):
-            labels = KNN.__predict(validation_samples, \
-                K, \
-                self.__options.weights, \
-                self.__options.P, \
-                self.__training_labels, \
-                self.__training_samples, \
-                self.__neighbour_weighting_func)
+        neighbour_indices, neighbour_distances_squared = self.__nearest_neighbours(validation_samples, self.__options.max_K, self.__training_samples, True)
+        sweep = KNN.__sweep_K(self.__training_codes[neighbour_indices], neighbour_distances_squared, self.__unique_labels, self.__options.neighbour_weighting_strategy)
+        for K, labels in sweep:
             performance = (labels == validation_labels).sum()
             
             print('K {}. Correct {} out of {} ({}%)'.format( \
@@ -102,12 +371,40 @@ class KNN:
         self.__K = best_K
         return best_K, best_performance
 
+    def measure_recall(self, samples, K):
+        """Measures how well the search strategy finds the `K` nearest neighbours of `samples` compared to an exact brute force search.
+        This is mostly useful to pick the `list_count` and `probe_count` of an `INVERTED_FILE` index.
+
+        `samples` -- A NumPy array with the same shape as the training data.\n
+        `K` -- The number of neighbours to find.
+
+        Returns the recall (the fraction of the exact `K` nearest neighbours that were found, where neighbours at the same distance are interchangeable),
+        the fraction of predicted labels that equal the labels predicted by the exact search,
+        and the time in seconds it took to find the neighbours with the search strategy and with the exact search.
+        """
+        start = time.perf_counter()
+        neighbour_indices, neighbour_distances_squared = self.__nearest_neighbours(samples, K, self.__training_samples, True)
+        seconds = time.perf_counter() - start
+
+        options = self.__options
+        start = time.perf_counter()
+        exact_indices, exact_distances_squared = KNN.__brute_force_neighbours(samples, K, options.weights, options.P, self.__training_samples, options.block_size, True)
+        exact_seconds = time.perf_counter() - start
+
+        # A neighbour counts as found if it is at least as near as the K-th exact neighbour. Allow for the rounding of the index's distances.
+        found = neighbour_distances_squared <= exact_distances_squared[:, -1:] * (1 + 1e-9)
+        labels = KNN.__vote(self.__training_codes[neighbour_indices], neighbour_distances_squared, self.__unique_labels, self.__neighbour_weighting_func)
+        exact_labels = KNN.__vote(self.__training_codes[exact_indices], exact_distances_squared, self.__unique_labels, self.__neighbour_weighting_func)
+
+        return found.mean(), (labels == exact_labels).mean(), seconds, exact_seconds
+
     def predict(self, samples, training_labels = None, training_samples = None):
         """Predicts the labels for the given `samples` and returns it as a 1 dimensional NumPy array.
 
         `samples` -- An array of strings containing the labels of the sample that the algorithm is going to predict the labels for.\n
         `training_labels` -- An array containing the training labels. If `None`, uses the labels passed to the constructor. (Default = `None`)\n
         `training_samples` -- A NumPy array containing the training samples. If `None`, uses the samples passed to the constructor. (Default = `None`)
+        The spatial index is only used for the samples passed to the constructor, other training samples are always searched by brute force.
         
         Returns the predicted labels as a 1 dimensional NumPy array.
 
@@ -116,14 +413,26 @@ class KNN:
         if not self.__K:
             raise Exception('K was not determined. Call determine_best_K() first before calling predict().')
        
-        if training_labels is None:
-            training_labels = self.__training_labels
+        unique_labels, training_codes = self.__unique_labels, self.__training_codes
+        if training_labels is not None:
+            unique_labels, training_codes = KNN.__encode(training_labels)
         if training_samples is None:
             training_samples = self.__training_samples
-        return KNN.__predict(samples, \
-            self.__K, \
-            self.__options.weights, \
-            self.__options.P, \
-            training_labels, \
-            training_samples, \
-            self.__neighbour_weighting_func)
+        neighbour_indices, neighbour_distances_squared = self.__nearest_neighbours(samples, self.__K, training_samples, False)
+        return KNN.__vote(training_codes[neighbour_indices], neighbour_distances_squared, unique_labels, self.__neighbour_weighting_func)
+
+    def predict_stream(self, sample_chunks, output_file = None):
+        """Predicts the labels for a stream of chunks of samples, one chunk at a time. Unlike `predict()`, the memory use does not depend on the total number of samples.
+
+        `sample_chunks` -- An iterable of NumPy arrays with samples, like the generator returned by `importData.import_unlabeled_chunks()`.\n
+        `output_file` -- A text file to write the labels to, one per line, as soon as a chunk is predicted. If `None`, the labels are only yielded. (Default = `None`)
+
+        Yields the predicted labels of each chunk as a 1 dimensional NumPy array.
+
+        Raises an error if `determine_best_K()` was never called.
+        """
+        for samples in sample_chunks:
+            labels = self.predict(samples)
+            if output_file is not None:
+                output_file.writelines('{}\n'.format(label) for label in labels)
+            yield labels
@@ -1,68 +1,85 @@
 import numpy as np
+import itertools as it
+import glob
+import hashlib
+import os
 
-def import_training_data(path):
-    data_points = np.genfromtxt(
-        path,
-        delimiter = ';',
-        usecols = [1, 2, 3, 4, 5, 6, 7],
-        converters = {
-            5: lambda s: 0 if s == b"-1" else float(s),
-            7: lambda s: 0 if s == b"-1" else float(s)
-        }
-    )
+# The seasons of a year and the month and day (as MMDD) on which each season after winter starts.
+SEASONS = np.array(['winter', 'lente', 'zomer', 'herfst', 'winter'])
+SEASON_STARTS = np.array([301, 601, 901, 1201])
 
-    dates = np.genfromtxt(path, delimiter=';', usecols=[0])
-    labels = []
-    for label in dates:
-        if label < 20000301:
-            labels.append('winter')
-        elif 20000301 <= label < 20000601:
-            labels.append('lente') 
-        elif 20000601 <= label < 20000901:
-            labels.append('zomer') 
-        elif 20000901 <= label < 20001201: 
-            labels.append('herfst')
-        else: # from 01-12 to end of year 
-            labels.append('winter')
-    
-    return np.array(labels), data_points
+def _load(source, has_dates):
+    """Parses all columns of `source` (a path or a list of lines) in a single pass.
 
-def import_validation_data(path):
-    data_points = np.genfromtxt(
-        path,
-        delimiter = ';',
-        usecols = [1, 2, 3, 4, 5, 6, 7],
-        converters = {
-            5: lambda s: 0 if s == b"-1" else float(s),
-            7: lambda s: 0 if s == b"-1" else float(s)
-        }
-    )
+    Returns a 2-d ndarray with the dates in the first column (only if `has_dates` is `True`) followed by the data points.
+    A value of -1 in the 4th or 6th column of the data points means that the measurement is missing. It is replaced by 0."""
+    columns = np.loadtxt(source, delimiter = ';', usecols = range(0 if has_dates else 1, 8), ndmin = 2)
+    sentinel_columns = [5, 7] if has_dates else [4, 6]
+    missing = columns[:, sentinel_columns]
+    missing[missing == -1] = 0
+    columns[:, sentinel_columns] = missing
+    return columns
 
-    dates = np.genfromtxt(path, delimiter=';', usecols=[0])
-    labels = []
-    for label in dates:
-        if label < 20010301:
-            labels.append('winter')
-        elif 20010301 <= label < 20010601:
-            labels.append('lente') 
-        elif 20010601 <= label < 20010901:
-            labels.append('zomer') 
-        elif 20010901 <= label < 20011201: 
-            labels.append('herfst')
-        else: # from 01-12 to end of year 
-            labels.append('winter')
+def _load_cached(path, has_dates):
+    """Returns the same as `_load()` but caches the parsed columns in a binary `.npy` file next to the file at `path`.
 
-    return np.array(labels), data_points
+    The name of the cache file contains a hash of the path, size and modification time of the file, so any change to the file invalidates the cache.
+    Later calls memory-map the cache file without copying it, so processes that load the same file share one copy of it in the page cache.
+    The returned array is read-only in that case."""
+    stat = os.stat(path)
+    key = hashlib.sha1('{}:{}:{}:{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, has_dates).encode()).hexdigest()[:16]
+    cache_path = '{}.{}.cache.npy'.format(path, key)
+    if os.path.exists(cache_path):
+        return np.load(cache_path, mmap_mode = 'r')
 
-def import_unlabeled(path):
-    data_points = np.genfromtxt(
-        path,
-        delimiter = ';',
-        usecols = [1, 2, 3, 4, 5, 6, 7],
-        converters = {
-            5: lambda s: 0 if s == b"-1" else float(s),
-            7: lambda s: 0 if s == b"-1" else float(s)
-        }
-    )
+    columns = _load(path, has_dates)
+    try:
+        # Remove the caches of older versions of the file and write to a temporary file first so that other processes never see a partial cache.
+        for stale_path in glob.glob('{}.*.cache.npy'.format(glob.escape(path))):
+            os.remove(stale_path)
+        temporary_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(temporary_path, 'wb') as file:
+            np.save(file, columns)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass # Caching is only an optimization, so a read-only directory is no reason to fail.
 
-    return data_points
+    return columns
+
+def _as_dtype(samples, dtype):
+    """Returns `samples` converted to `dtype`. This copies `samples` unless they already have that type.
+    Raises an exception if `dtype` is an integer type and not all values are whole numbers, since they would be cut off."""
+    if np.issubdtype(dtype, np.integer) and not (samples == np.round(samples)).all():
+        raise Exception('Not all values are whole numbers, so they cannot be stored as {}.'.format(np.dtype(dtype).name))
+    return samples.astype(dtype, copy = False)
+
+def _season_labels(dates, year):
+    """Returns the name of the season of each of the `dates` (as YYYYMMDD) as a 1-d ndarray.
+    Dates before or after `year` are labeled as winter."""
+    return SEASONS[np.searchsorted(SEASON_STARTS + year * 10000, dates, side = 'right')]
+
+# All measurements are whole numbers (in tenths of units), so the samples can be imported with a `dtype` of `np.float32` or `np.int32`
+# instead of the default `np.float64`. That halves their memory use and the memory traffic of the distance calculations.
+# The cache always holds `np.float64` columns (the dates do not fit in a `np.float32`), so any other `dtype` makes a converted copy.
+
+def import_training_data(path, use_cache = True, dtype = np.float64):
+    columns = _load_cached(path, True) if use_cache else _load(path, True)
+    return _season_labels(columns[:, 0], 2000), _as_dtype(columns[:, 1:], dtype)
+
+def import_validation_data(path, use_cache = True, dtype = np.float64):
+    columns = _load_cached(path, True) if use_cache else _load(path, True)
+    return _season_labels(columns[:, 0], 2001), _as_dtype(columns[:, 1:], dtype)
+
+def import_unlabeled(path, use_cache = True, dtype = np.float64):
+    return _as_dtype(_load_cached(path, False) if use_cache else _load(path, False), dtype)
+
+def import_unlabeled_chunks(path, chunk_size, dtype = np.float64):
+    """Yields the samples in the file at `path` as ndarrays of `dtype` of at most `chunk_size` samples.
+    Only one chunk is read into memory at a time, so this can be used for files of any size."""
+    with open(path) as file:
+        while True:
+            lines = list(it.islice(file, chunk_size))
+            if not lines:
+                return
+
+            yield _as_dtype(_load(lines, False), dtype)
@@ -0,0 +1,83 @@
+import utility as util
+import numpy as np
+from sklearn.cluster import KMeans
+
+class InvertedFileIndex:
+    """An approximate nearest neighbour index that trades a bit of accuracy for much faster queries on large sets of samples.
+
+    The samples are clustered with K-Means once. Each cluster is an inverted list of the samples that are closest to its centroid.
+    A query only calculates the distances to the samples in the `probe_count` lists with the nearest centroids instead of to all samples.
+    Probing more lists finds more of the true nearest neighbours (a higher recall) but makes the queries slower.
+
+    `query()` has the same signature as the one of the scikit-learn `KDTree` and `BallTree` so the index can be used in their place.
+    """
+
+    def __init__(self, samples, P, list_count = None, probe_count = 1, seed = None, block_size = 2 ** 22):
+        """
+        `samples` -- A 2-d ndarray with the samples to index.\n
+        `P` -- The power parameter for the Minkowski distance algorithm.\n
+        `list_count` -- The number of inverted lists (clusters). If `None`, uses the square root of the number of samples. (Default = `None`)\n
+        `probe_count` -- The number of lists that are searched for each query. (Default = `1`)\n
+        `seed` -- The seed for the K-Means clustering. (Default = `None`)\n
+        `block_size` -- The maximum number of distances that are calculated at once by `query()`. (Default = `2 ** 22`)
+        """
+        if list_count is None:
+            list_count = max(1, int(np.sqrt(samples.shape[0])))
+        self.__P, self.__probe_count, self.__block_size = P, probe_count, block_size
+
+        k_means = KMeans(n_clusters = list_count, n_init = 1, random_state = seed).fit(samples)
+        self.__centroids = k_means.cluster_centers_
+        self.__list_sizes = np.bincount(k_means.labels_, minlength = list_count)
+
+        # Store the lists as rows of equal length, padded up to the longest list, with each dimension in its own array.
+        # A batch of queries can then gather the samples of all lists it probes with one indexing operation per dimension.
+        # `__list_members` holds the index of each sample in its list and -1 for the padding.
+        list_members = np.argsort(k_means.labels_, kind = 'stable')
+        list_starts = np.concatenate(([0], np.cumsum(self.__list_sizes)[:-1]))
+        labels = k_means.labels_[list_members]
+        columns = np.arange(samples.shape[0]) - list_starts[labels]
+        self.__list_members = np.full((list_count, self.__list_sizes.max()), -1, dtype = np.intp)
+        self.__list_members[labels, columns] = list_members
+        self.__list_samples = np.zeros((samples.shape[1],) + self.__list_members.shape, dtype = samples.dtype)
+        self.__list_samples[:, labels, columns] = samples[list_members].T
+
+    def query(self, samples, k):
+        """Returns the approximate Minkowski distances to and indices of the `k` nearest indexed samples of each of the `samples`
+        as two ndarrays of shape `[samples.shape[0], k]`. The neighbours of each sample are sorted from nearest to farthest.
+
+        All samples are searched at once: a chunk of samples gathers the padded lists that each of them probes into one block of distances,
+        so there is no Python work per sample or per list."""
+        centroid_distances = util.minkowski_squared_batch(samples, self.__centroids, None, self.__P)
+        lists = np.argsort(centroid_distances, axis = 1, kind = 'stable')
+
+        # Probe at least `probe_count` lists but keep probing the next nearest lists until they hold at least `k` samples.
+        probed_sizes = np.cumsum(self.__list_sizes[lists], axis = 1)
+        probe_counts = np.maximum(self.__probe_count, (probed_sizes < k).sum(axis = 1) + 1)
+        max_probe_count = min(probe_counts.max(), lists.shape[1])
+        lists = lists[:, :max_probe_count]
+        probed = np.arange(max_probe_count) < probe_counts.reshape(-1, 1)
+
+        neighbour_distances_squared = np.empty((samples.shape[0], k))
+        neighbour_indices = np.empty((samples.shape[0], k), dtype = np.intp)
+        chunk_size = max(1, self.__block_size // (max_probe_count * self.__list_members.shape[1]))
+        for start in range(0, samples.shape[0], chunk_size):
+            chunk_lists = lists[start:start + chunk_size]
+
+            # A [chunk size, probes, longest list] block with the distance to each sample of each probed list, like `util.minkowski_squared_batch()`.
+            distances_squared = np.zeros(chunk_lists.shape + self.__list_members.shape[1:])
+            for dimension, list_samples in enumerate(self.__list_samples):
+                difference = np.abs(samples[start:start + chunk_size, dimension, np.newaxis, np.newaxis] - list_samples[chunk_lists])
+                distances_squared += difference ** self.__P
+
+            # The padding and the lists that the sample does not probe are never neighbours.
+            candidates = self.__list_members[chunk_lists]
+            distances_squared[(candidates < 0) | ~probed[start:start + chunk_size, :, np.newaxis]] = np.inf
+            distances_squared, candidates = distances_squared.reshape(chunk_lists.shape[0], -1), candidates.reshape(chunk_lists.shape[0], -1)
+
+            nearest = np.argpartition(distances_squared, k-1, axis = 1)[:, :k]
+            nearest_distances_squared = np.take_along_axis(distances_squared, nearest, axis = 1)
+            order = np.argsort(nearest_distances_squared, axis = 1, kind = 'stable')
+            neighbour_distances_squared[start:start + chunk_size] = np.take_along_axis(nearest_distances_squared, order, axis = 1)
+            neighbour_indices[start:start + chunk_size] = np.take_along_axis(candidates, np.take_along_axis(nearest, order, axis = 1), axis = 1)
+
+        return neighbour_distances_squared ** (1.0 / self.__P), neighbour_indices
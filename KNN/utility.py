@@ -6,6 +6,35 @@ def minkowski_squared(sample1, sample2, weights = None, P = 2):
         return ((np.fabs(sample1 - sample2) * weights) ** P).sum()
     return (np.fabs(sample1 - sample2) ** P).sum()
 
+def minkowski_squared_batch(samples1, samples2, weights = None, P = 2):
+    """Returns a 2-d ndarray with the `minkowski_squared()` distance from each sample in `samples1` to each sample in `samples2`.
+    Element `[i, j]` is the distance from `samples1[i]` to `samples2[j]`.
+
+    The distances are accumulated one dimension at a time using broadcasting, so apart from the result only one other
+    block of the same shape is allocated, no matter how many dimensions the samples have.
+
+    The differences are calculated in the type of the samples (at least `np.float32`) and accumulated in `np.float64`.
+    If both `samples1` and `samples2` hold integers, there are no `weights` and `P` is a whole number, the distances are exact integers
+    that are calculated in `np.int64`, so ties between neighbours are never broken by rounding errors."""
+    samples1 = samples1.reshape(samples1.shape[0], -1)
+    samples2 = samples2.reshape(samples2.shape[0], -1)
+    dtype = np.result_type(samples1.dtype, samples2.dtype)
+    if np.issubdtype(dtype, np.integer) and weights is None and float(P).is_integer():
+        dtype, P = np.int64, int(P)
+        distances = np.zeros((samples1.shape[0], samples2.shape[0]), dtype = np.int64)
+    else:
+        dtype = np.result_type(dtype, np.float32)
+        distances = np.zeros((samples1.shape[0], samples2.shape[0]))
+    difference = np.empty(distances.shape, dtype = dtype)
+    for dimension in range(samples1.shape[1]):
+        np.subtract(samples1[:, dimension, np.newaxis], samples2[np.newaxis, :, dimension], out = difference)
+        np.abs(difference, out = difference)
+        if weights is not None:
+            difference *= weights.reshape(-1)[dimension]
+        difference **= P
+        distances += difference
+    return distances
+
 def majority_vote(neighbour_labels, _ = None):
     return Counter(neighbour_labels).most_common(1)[0][0]
 
@@ -15,4 +44,31 @@ def weighted_majority_vote(neighbour_labels, neighbour_distances_squared):
     for i in range(neighbour_labels.shape[0]):
         label_votes[neighbour_labels[i]] += neighbour_distances_squared[i]
 
-    return max(label_votes, key = label_votes.get)
\ No newline at end of file
+    return max(label_votes, key = label_votes.get)
+
+def majority_vote_batch(neighbour_codes, label_count, _ = None):
+    """Returns a 1-d ndarray with the label code that is most common in each row of `neighbour_codes`.
+
+    This is the batched version of `majority_vote()` for labels that are encoded as integer codes from 0 up to `label_count`.
+    Ties are won by the label that occurs first in the row, like `majority_vote()` does."""
+    return _vote_batch(neighbour_codes, label_count, np.ones(neighbour_codes.shape))
+
+def weighted_majority_vote_batch(neighbour_codes, label_count, neighbour_distances_squared):
+    """Returns a 1-d ndarray with the label code with the most amount of votes in each row of `neighbour_codes` where the vote of each neighbour equals 1 / neighbour distance.
+
+    This is the batched version of `weighted_majority_vote()` for labels that are encoded as integer codes from 0 up to `label_count`."""
+    return _vote_batch(neighbour_codes, label_count, 1.0 / (neighbour_distances_squared ** 0.5))
+
+def _vote_batch(neighbour_codes, label_count, neighbour_votes):
+    rows = np.arange(neighbour_codes.shape[0])
+
+    # Accumulate the votes of all rows at once by giving each (row, label code) pair its own bin.
+    bins = rows.reshape(-1, 1) * label_count + neighbour_codes
+    votes = np.bincount(bins.reshape(-1), weights = neighbour_votes.reshape(-1), minlength = rows.shape[0] * label_count).reshape(-1, label_count)
+
+    # Find the position of the first occurrence of each label code in each row to break ties.
+    first_positions = np.full(votes.shape, neighbour_codes.shape[1])
+    for position in reversed(range(neighbour_codes.shape[1])):
+        first_positions[rows, neighbour_codes[:, position]] = position
+
+    return np.where(votes == votes.max(axis = 1, keepdims = True), first_positions, neighbour_codes.shape[1]).argmin(axis = 1)
\ No newline at end of file
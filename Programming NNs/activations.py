@@ -0,0 +1,96 @@
+import numpy as np
+
+class Activation:
+    """An activation function that works on whole arrays of sums at once, together with its derivative.
+    This lets a network activate all neurons of a layer that share an activation function with one call.
+    """
+    def __init__(self, function, derivative, in_place = None):
+        """
+        `function` -- A function that accepts an ndarray of sums and returns an ndarray of the same shape with the activation value of each sum.\n
+        `derivative` -- A function that accepts an ndarray of sums and the ndarray that `function` returned for them
+        and returns an ndarray with the derivative of the activation function for each sum. It can use the outputs to avoid calculating `function` again.\n
+        `in_place` -- A function that does the same as `function` but overwrites the ndarray of sums with the activation values instead of allocating new arrays.
+        It accepts the ndarray of sums and a scratch ndarray of the same shape that it may overwrite, or `None` if it has to allocate one itself.
+        If `None`, `apply_in_place()` uses `function`. (Default = `None`)
+        """
+        self.function = function
+        self.derivative = derivative
+        self.in_place = in_place
+
+    def apply_in_place(self, sums, workspace = None):
+        """Overwrites the ndarray `sums` with the activation value of each sum.
+        `workspace` is an ndarray with the same shape as `sums` that may be overwritten to avoid allocating a temporary array, or `None`. (Default = `None`)"""
+        if self.in_place is not None:
+            self.in_place(sums, workspace)
+        else:
+            sums[...] = self.function(sums)
+
+    @staticmethod
+    def from_scalar(function, derivative = None):
+        """Returns an `Activation` that applies a scalar `function` and `derivative` (like the ones of `NeuronInfo`) to each sum one by one.
+        `derivative` may be `None` for neurons that are not trained."""
+        apply = lambda scalar_function, sums: np.array(list(map(scalar_function, sums.ravel().tolist())), dtype = np.float64).reshape(sums.shape)
+        return Activation(lambda sums: apply(function, sums), lambda sums, _: apply(derivative, sums))
+
+def _sigmoid(sums):
+    # 1 / (1 + e^-x) written as e^-log(1 + e^-x) does not overflow for large negative sums.
+    return np.exp(-np.logaddexp(0, -sums))
+
+def _sigmoid_in_place(sums, _):
+    np.negative(sums, out = sums)
+    np.logaddexp(0, sums, out = sums)
+    np.negative(sums, out = sums)
+    np.exp(sums, out = sums)
+
+def _leaky_relu_in_place(sums, workspace):
+    workspace = np.empty(sums.shape) if workspace is None else workspace
+    np.multiply(sums, 0.01, out = workspace)
+    np.maximum(sums, workspace, out = sums)
+
+# The activation functions that `NeuronInfo` accepts by name.
+ACTIVATIONS = {
+    'identity': Activation(lambda sums: sums.copy(), lambda sums, _: np.ones(sums.shape), lambda sums, _: None),
+    'threshold': Activation(lambda sums: (sums >= 0).astype(np.float64), lambda sums, _: np.zeros(sums.shape), lambda sums, _: np.greater_equal(sums, 0, out = sums)),
+    'ReLU': Activation(lambda sums: np.maximum(sums, 0.0), lambda sums, _: (sums >= 0).astype(np.float64), lambda sums, _: np.maximum(sums, 0.0, out = sums)),
+    'LReLU': Activation(lambda sums: np.maximum(0.01 * sums, sums), lambda sums, _: np.where(sums >= 0, 1.0, 0.01), _leaky_relu_in_place),
+    'sigmoid': Activation(_sigmoid, lambda _, outputs: outputs * (1 - outputs), _sigmoid_in_place),
+    'tanh': Activation(np.tanh, lambda _, outputs: 1 - outputs ** 2, lambda sums, _: np.tanh(sums, out = sums)),
+    # log(1 + e^x). Its derivative is the sigmoid, which equals 1 - e^-softplus(x).
+    'softplus': Activation(lambda sums: np.logaddexp(0, sums), lambda _, outputs: -np.expm1(-outputs), lambda sums, _: np.logaddexp(0, sums, out = sums)),
+}
+
+def get_activation(name):
+    """Returns the `Activation` in `ACTIVATIONS` with the given `name`."""
+    if name not in ACTIVATIONS:
+        raise Exception('Unknown activation function \'{}\'. Use one of: {}.'.format(name, ', '.join(ACTIVATIONS)))
+    return ACTIVATIONS[name]
+
+def group_activations(neuron_activations):
+    """Groups the neurons of a layer by their activation function so that each group can be activated with one call.
+
+    `neuron_activations` -- A list with the activation function of each neuron of the layer: either the name of one of the `ACTIVATIONS`
+    or a pair of a scalar activation function and its derivative (see `NeuronInfo`).
+
+    Returns a list with for each group the columns of its neurons in the layer and its `Activation`.
+    The columns are a slice when all neurons share an activation function, so that indexing with them does not copy."""
+    groups = {}
+    for j, neuron_activation in enumerate(neuron_activations):
+        if neuron_activation not in groups:
+            activation = get_activation(neuron_activation) if isinstance(neuron_activation, str) else Activation.from_scalar(*neuron_activation)
+            groups[neuron_activation] = ([], activation)
+        groups[neuron_activation][0].append(j)
+
+    return [(columns if len(columns) < len(neuron_activations) else slice(None), activation) for columns, activation in groups.values()]
+
+def activate_in_place(activations, sums, workspace = None):
+    """Overwrites `sums`, a 2-d array with a row for each sample and a column for each neuron of a layer, with the outputs of the neurons.
+    `activations` are the groups of the layer that `group_activations()` returns. `workspace` is an array with the same shape as `sums`
+    that may be overwritten, or `None`. (Default = `None`)
+
+    A layer with a single activation function is activated without allocating any arrays when `workspace` is given.
+    A layer that mixes activation functions still allocates, since each group is activated on a copy of its columns."""
+    for columns, activation in activations:
+        if isinstance(columns, slice):
+            activation.apply_in_place(sums, workspace)
+        else:
+            sums[:, columns] = activation.function(sums[:, columns])
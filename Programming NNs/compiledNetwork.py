@@ -0,0 +1,87 @@
+from activations import group_activations, activate_in_place
+
+import numpy as np
+import threading
+
+class CompiledNetwork:
+    """A trained `NeuralNetwork` reduced to what is needed for inference: the weights and activation functions of each layer.
+
+    It holds no state between calls, so one instance can be shared by many threads. Each thread gets its own workspace for the
+    outputs of the hidden layers and the scratch arrays of the activation functions, which is allocated once per batch size and reused,
+    so `predict()` only allocates the array it returns. The exception are layers that mix activation functions, see `activations.activate_in_place()`.
+    Use `NeuralNetwork.compile()` to create one.
+    """
+
+    def __init__(self, weights, neuron_activations):
+        """
+        `weights` -- A list with the weights of each layer as a 2-d array with a row for each neuron and a column for each neuron of the previous layer.
+        The last column holds the weights of the connections with the bias.\n
+        `neuron_activations` -- A list with for each layer a list with the activation function of each neuron,
+        either a name of one of the `activations.ACTIVATIONS` or a pair of a scalar activation function and its derivative.
+        """
+        if len(weights) != len(neuron_activations):
+            raise Exception('There must be activation functions for each of the {} layers, but there are {}.'.format(len(weights), len(neuron_activations)))
+        # Stored transposed, so that a batch with a row per sample is multiplied without copying, and with the bias weights split off.
+        self.__weights = [np.ascontiguousarray(layer_weights[:, :-1].T, dtype = np.float64) for layer_weights in weights]
+        self.__biases = [np.array(layer_weights[:, -1], dtype = np.float64) for layer_weights in weights]
+        self.__neuron_activations = [list(layer_activations) for layer_activations in neuron_activations]
+        self.__activations = [group_activations(layer_activations) for layer_activations in neuron_activations]
+        self.__workspace = threading.local()
+
+    @property
+    def input_count(self):
+        return self.__weights[0].shape[0]
+
+    @property
+    def output_count(self):
+        return self.__weights[-1].shape[1]
+
+    def __buffers(self, sample_count):
+        """Returns the arrays of the calling thread for a batch of `sample_count` samples: a list with the outputs of each hidden layer
+        and a list with a scratch array for the activation functions of each layer."""
+        buffers = getattr(self.__workspace, 'buffers', None)
+        if buffers is None or buffers[0] != sample_count:
+            scratch = np.empty((sample_count, max(weights.shape[1] for weights in self.__weights)))
+            buffers = (sample_count, [np.empty((sample_count, weights.shape[1])) for weights in self.__weights[:-1]],
+                [scratch[:, :weights.shape[1]] for weights in self.__weights])
+            self.__workspace.buffers = buffers
+        return buffers[1], buffers[2]
+
+    def predict(self, inputs):
+        """Returns a 2-d array with the outputs of the network for each row of `inputs`, a 2-d array with a column for each input of the network.
+        Gives the same outputs as calling `NeuralNetwork.activate()` for each row."""
+        inputs = np.asarray(inputs, dtype = np.float64)
+        if inputs.ndim != 2 or inputs.shape[1] != self.input_count:
+            raise Exception('The inputs must be a 2-d array with {} columns, but they have shape {}.'.format(self.input_count, inputs.shape))
+
+        outputs = np.empty((inputs.shape[0], self.output_count))
+        hidden_outputs, scratch = self.__buffers(inputs.shape[0])
+        layer_input = inputs
+        for weights, bias, activations, layer_output, layer_scratch in zip(self.__weights, self.__biases, self.__activations, hidden_outputs + [outputs], scratch):
+            np.matmul(layer_input, weights, out = layer_output)
+            layer_output += bias
+            activate_in_place(activations, layer_output, layer_scratch)
+            layer_input = layer_output
+
+        return outputs
+
+    def save(self, path):
+        """Saves the weights and the names of the activation functions to a binary `.npz` file at `path`.
+        Only networks that use named activation functions can be saved."""
+        arrays = {}
+        for i, (weights, bias, layer_activations) in enumerate(zip(self.__weights, self.__biases, self.__neuron_activations)):
+            if not all(isinstance(activation, str) for activation in layer_activations):
+                raise Exception('Layer {} has neurons with a scalar activation function, which cannot be saved. Use the names of the activations.ACTIVATIONS instead.'.format(i))
+            arrays['weights_{}'.format(i)] = np.hstack((weights.T, bias[:, np.newaxis]))
+            arrays['activations_{}'.format(i)] = np.array(layer_activations, dtype = np.str_)
+        with open(path, 'wb') as file:
+            np.savez(file, **arrays)
+
+    @staticmethod
+    def load(path):
+        """Returns the `CompiledNetwork` that was saved to the file at `path` with `save()`."""
+        with np.load(path, allow_pickle = False) as arrays:
+            layer_count = sum(1 for name in arrays.files if name.startswith('weights_'))
+            weights = [arrays['weights_{}'.format(i)] for i in range(layer_count)]
+            neuron_activations = [arrays['activations_{}'.format(i)].tolist() for i in range(layer_count)]
+        return CompiledNetwork(weights, neuron_activations)
@@ -1,36 +1,14 @@
 from neuralNetwork import NeuralNetwork, NeuronInfo
 
-import math
 import numpy as np
 import matplotlib.pyplot as plt
 from functools import partial
 
-# Possible activation functions
+# Possible activation functions. The ones that are used for training are passed to `NeuronInfo` by name.
+# See `activations.ACTIVATIONS` for all of them: identity, threshold, ReLU, LReLU, sigmoid, tanh and softplus.
 def threshold(threshold, sum):
     return 1.0 if sum >= threshold else 0.0
 
-def ReLU(sum):
-    return max(0.0, sum)
-
-def ReLU_derivative(sum):
-    return 1 if sum >= 0 else 0
-
-def LReLU(sum):
-    return max(0.01 * sum, sum)
-
-def LReLU_derivative(sum):
-    return 1 if sum >= 0 else 0.01
-
-def sigmoid(sum):
-    return 1 / (1 + math.exp(-sum))
-
-def sigmoid_derivative(sum):
-    sig = sigmoid(sum)
-    return sig * (1 - sig)
-
-def tanh_derivative(sum):
-    return 1 - math.tanh(math.tanh(sum))
-
 np.set_printoptions(precision=4)
 
 # 4.3 A. NOR Gate
@@ -86,7 +64,7 @@ nn = NeuralNetwork(
     3,
     [],
     [
-        NeuronInfo(sigmoid, sigmoid_derivative)
+        NeuronInfo('sigmoid')
     ]
 )
 
@@ -121,12 +99,10 @@ expected_outputs = np.array([
 nn.train(inputs, expected_outputs, learning_rate, epochs)
 
 print('After training:')
-MSE = 0.0
-for input, expected_output in zip(inputs, expected_outputs):
-    output = nn.activate(input)
+outputs = nn.activate_batch(inputs)
+for input, output in zip(inputs, outputs):
     print('{} -> {}'.format(input, output))
-    MSE += ((expected_output - output) ** 2).sum()
-print('MSE: {}\n'.format(MSE / len(inputs)))
+print('MSE: {}\n'.format(((expected_outputs - outputs) ** 2).sum() / len(inputs)))
 
 # 4.3 C. XOR and Back-propagation
 # Neural Network Settings
@@ -139,12 +115,12 @@ nn = NeuralNetwork(
     2,
     [
         [
-            NeuronInfo(sigmoid, sigmoid_derivative),
-            NeuronInfo(sigmoid, sigmoid_derivative)
+            NeuronInfo('sigmoid'),
+            NeuronInfo('sigmoid')
         ],
     ],
     [
-        NeuronInfo(sigmoid, sigmoid_derivative)
+        NeuronInfo('sigmoid')
     ]
 )
 
@@ -168,12 +144,10 @@ expected_outputs = np.array([
 errors = nn.train(inputs, expected_outputs, learning_rate, epochs)
 
 print('After training:')
-MSE = 0.0
-for input, expected_output in zip(inputs, expected_outputs):
-    output = nn.activate(input)
+outputs = nn.activate_batch(inputs)
+for input, output in zip(inputs, outputs):
     print('{} -> {}'.format(input, output))
-    MSE += ((expected_output - output) ** 2).sum()
-print('MSE: {}\n'.format(MSE / len(inputs)))
+print('MSE: {}\n'.format(((expected_outputs - outputs) ** 2).sum() / len(inputs)))
     
 plt.plot(errors / inputs.shape[0], linewidth = 1.0)
 plt.title('XOR')
@@ -195,16 +169,16 @@ nn = NeuralNetwork(
     4,
     [
         [
-            NeuronInfo(sigmoid, sigmoid_derivative),
-            NeuronInfo(sigmoid, sigmoid_derivative),
-            NeuronInfo(sigmoid, sigmoid_derivative),
-            NeuronInfo(sigmoid, sigmoid_derivative),
+            NeuronInfo('sigmoid'),
+            NeuronInfo('sigmoid'),
+            NeuronInfo('sigmoid'),
+            NeuronInfo('sigmoid'),
         ],
     ],
     [
-        NeuronInfo(sigmoid, sigmoid_derivative),
-        NeuronInfo(sigmoid, sigmoid_derivative),
-        NeuronInfo(sigmoid, sigmoid_derivative),
+        NeuronInfo('sigmoid'),
+        NeuronInfo('sigmoid'),
+        NeuronInfo('sigmoid'),
     ]
 )
 
@@ -240,15 +214,13 @@ def threshold_output(output, min, max, minimum_certainty):
     return copy
 
 # Show the result per input sample
-MSE = 0.0
-correct_count = 0
-for input, expected_output in zip(val_samples, val_labels):
-    output = nn.activate(input)
-    correct = (threshold_output(output, 0.0, 1.0, minimum_certainty) == expected_output).all()
-    correct_count += correct
+outputs = nn.activate_batch(val_samples)
+corrects = (threshold_output(outputs, 0.0, 1.0, minimum_certainty) == val_labels).all(axis = 1)
+for input, output, expected_output, correct in zip(val_samples, outputs, val_labels, corrects):
     print('{} -> {} expected: {}. {}'.format(input, output, expected_output, 'Correct' if correct else 'Not correct' ))
 
-    MSE += ((expected_output - output) ** 2).sum()
+MSE = ((val_labels - outputs) ** 2).sum()
+correct_count = np.count_nonzero(corrects)
 
 # Show the aggregate results
 print('Mean squared error for validation set: {:0.5f}\nCorrect: {:0.2f}% ({}/{})'.format( \
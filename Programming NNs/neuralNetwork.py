@@ -1,6 +1,5 @@
-from neuron import Neuron
-from inputNeuron import InputNeuron
-from biasNeuron import BiasNeuron
+from activations import group_activations, activate_in_place
+from compiledNetwork import CompiledNetwork
 
 import numpy as np
 
@@ -11,9 +10,10 @@ class NeuronInfo():
     def __init__(self, activation_function = None, activation_function_derivative = None, weights = None):
         """
         `activation_function` -- A function that accepts a single number as an argument and returns a single number.
-        This is the activation function of the neuron.\n
+        This is the activation function of the neuron. It can also be the name of one of the `activations.ACTIVATIONS` (like `'sigmoid'`),
+        which work on all neurons of a layer at once and are much faster.\n
         `activation_function_derivative` -- a function with the same signature as `activation_function` that also returns a single number.
-        It is the derivative of the activation function which is used during the training phase.\n
+        It is the derivative of the activation function which is used during the training phase. Leave it `None` for a named activation function.\n
         `weights` -- An array of numbers containing the weights of the connections leading to this neuron.
         The last element is the weight for the connection with the bias in the previous layer of the neuron.
         """
@@ -28,21 +28,41 @@ class NeuralNetwork:
     
     The topology of the network is fixed and specified as parameters to `__init__()`.
     Any number of input and output neurons and any number of hidden layers of any size are supported.
+
+    The weights of each layer are stored as a single 2-d array with a row for each neuron of the layer and a column for each neuron of the previous layer.
+    The last column holds the weights of the connections with the bias of the previous layer, like the last element of `NeuronInfo.weights`.
+    A layer is activated with one matrix-vector product.
+    The neurons of a layer that share an activation function are activated together with one call to it.
     """
     @staticmethod
-    def __activate_layer(layer):
-        for neuron in layer:
-            neuron.activate()
+    def __activate_layer(activations, sums):
+        """Applies the activation function of each neuron to its column of `sums`, a 2-d array with a row for each sample and a column for each neuron of a layer."""
+        outputs = np.empty(sums.shape)
+        for columns, activation in activations:
+            outputs[:, columns] = activation.function(sums[:, columns])
+        return outputs
+
+    @staticmethod
+    def __derive_layer(activations, sums, outputs):
+        """Returns the derivative of the activation function of each neuron for its column of `sums`. `outputs` are the activation values of those sums."""
+        derivatives = np.empty(sums.shape)
+        for columns, activation in activations:
+            derivatives[:, columns] = activation.derivative(sums[:, columns], outputs[:, columns])
+        return derivatives
 
     @staticmethod
-    def __randomize_layer(layer, rng, min, max):
-        for neuron in layer:
-            neuron.randomize_weights(rng, min, max)
+    def __append_bias(outputs):
+        """Returns `outputs`, a 2-d array with a row for each sample, with an extra column of 1's for the bias."""
+        return np.hstack((outputs, np.ones((outputs.shape[0], 1))))
 
     @staticmethod
-    def __update_layer(layer, learning_rate):
-        for neuron in layer:
-            neuron.update(learning_rate)
+    def __layer_weights(infos, input_count):
+        """Returns the weights of a layer of neurons described by `infos` that each have `input_count` inputs (including the bias) as a 2-d array."""
+        weights = np.zeros((len(infos), input_count))
+        for row, info in zip(weights, infos):
+            if info.weights is not None:
+                row[:] = info.weights
+        return weights
 
     def __init__(self, input_count, hidden_neurons, output_neurons):
         """Creates and initializes the neural network.
@@ -51,24 +71,34 @@ class NeuralNetwork:
         `hidden_neurons` -- A 2-d list of `NeuronInfo` instances. Each row represents a hidden layer.
         The layers can be of different lenghts.
         `output_neurons` -- a 1-d list of `NeuronInfo` instances. This represents output neurons.
+        Neurons without weights start with all weights at 0.
         """
-        # Initialize the input layer. The last element of the all layers will be the bias neuron.
-        self.__input_layer = [InputNeuron() for i in range(input_count)] + [BiasNeuron()]
-
-        # Initialize the hidden layers.
-        self.__hidden_layers = []
-        last_layer = self.__input_layer
-        for infos in hidden_neurons:
-            # The last element of the all layers will be the bias neuron.
-            layer = [Neuron(last_layer, info.weights, info.activation_function, info.activation_function_derivative) for info in infos] + [BiasNeuron()]
-            last_layer = layer
-            self.__hidden_layers.append(layer)
-
-        # Initialize the output layer.
-        self.__output_layer = [Neuron(last_layer, info.weights, info.activation_function, info.activation_function_derivative) for info in output_neurons]
+        self.__input_count = input_count
+        self.__weights, self.__neuron_activations, self.__activations = [], [], []
+        last_layer_count = input_count
+        for infos in list(hidden_neurons) + [output_neurons]:
+            # Each layer has an input for each neuron of the previous layer plus one for the bias.
+            self.__weights.append(NeuralNetwork.__layer_weights(infos, last_layer_count + 1))
+            neuron_activations = [info.activation_function if isinstance(info.activation_function, str) else (info.activation_function, info.activation_function_derivative) for info in infos]
+            self.__neuron_activations.append(neuron_activations)
+            self.__activations.append(group_activations(neuron_activations))
+            last_layer_count = len(infos)
+
+        # The state of the last forward pass that `train()` needs: the inputs of each layer (ending with the bias of 1), the weighted sums
+        # and the outputs of each layer, as 2-d arrays with a row for each sample.
+        self.__layer_inputs, self.__sums, self.__outputs = [None] * len(self.__weights), [None] * len(self.__weights), [None] * len(self.__weights)
+
+        # The buffers that `activate_batch()` reuses for the inputs of each layer (with a last column of 1's for the bias),
+        # a scratch array for the activation functions of each layer and the number of samples they were allocated for.
+        self.__batch_count, self.__batch_inputs, self.__batch_scratch = 0, None, None
 
     def __repr__(self):
-        return 'input:\n{}\nhidden:\n{}\noutput:\n{}'.format(self.__input_layer, '\n'.join(repr(l) for l in self.__hidden_layers), self.__output_layer)
+        neurons = lambda count, name: [name] * count
+        input_layer = neurons(self.__input_count, 'input') + ['bias']
+        hidden_layers = [neurons(weights.shape[0], 'neuron') + ['bias'] for weights in self.__weights[:-1]]
+        output_layer = neurons(self.__weights[-1].shape[0], 'neuron')
+        layer_repr = lambda layer: '[{}]'.format(', '.join(layer))
+        return 'input:\n{}\nhidden:\n{}\noutput:\n{}'.format(layer_repr(input_layer), '\n'.join(layer_repr(l) for l in hidden_layers), layer_repr(output_layer))
 
     def randomize(self, rng, min, max):
         """Randomizes all the weights in the network to be in the interval [`min`, `max`).
@@ -77,31 +107,78 @@ class NeuralNetwork:
         `min` - The lower bound of the interval that the weigts can be in.
         `max` - The upper bound of the interval that the weigts can be in.
         """
-        for hidden_layer in self.__hidden_layers:
-            NeuralNetwork.__randomize_layer(hidden_layer, rng, min, max)
-        NeuralNetwork.__randomize_layer(self.__output_layer, rng, min, max)
+        # The weights are drawn neuron by neuron, with the weight of the bias last.
+        for weights in self.__weights:
+            weights[:] = rng.rand(*weights.shape) * (max - min) + min
+
+    def __forward(self, inputs):
+        """Activates all layers 1 by 1 for a 2-d array of `inputs` with a row for each sample and returns the outputs with a row for each sample.
+        The inputs, sums and outputs of each layer are kept for `__back_propagate()`."""
+        layer_input = NeuralNetwork.__append_bias(inputs)
+        for i, (weights, activations) in enumerate(zip(self.__weights, self.__activations)):
+            self.__layer_inputs[i] = layer_input
+            self.__sums[i] = layer_input @ weights.T
+            self.__outputs[i] = NeuralNetwork.__activate_layer(activations, self.__sums[i])
+            layer_input = NeuralNetwork.__append_bias(self.__outputs[i])
+
+        return self.__outputs[-1]
 
     def activate(self, inputs):
         """Activates the network by inputting all `inputs` to the input layer, activating all layers 1 by 1
         and finally returns the outputs as a 1-d array of numbers.
         """
-        # Input the values into the network.
-        for input_neuron, input in zip(self.__input_layer, inputs):
-            input_neuron.set_output(input)
-
-        # Active the network.
-        for hidden_layer in self.__hidden_layers:
-            NeuralNetwork.__activate_layer(hidden_layer)
+        return self.__forward(np.asarray(inputs, dtype = np.float64).reshape(1, -1))[0]
+
+    def __batch_buffers(self, sample_count):
+        """Returns the buffers for the inputs of each layer and the scratch arrays for the activation functions of each layer for a batch of `sample_count` samples.
+        They are only allocated when the batch size changes."""
+        if self.__batch_inputs is None or self.__batch_count != sample_count:
+            self.__batch_inputs = [np.ones((sample_count, weights.shape[1])) for weights in self.__weights]
+            scratch = np.empty((sample_count, max(weights.shape[0] for weights in self.__weights)))
+            self.__batch_scratch = [scratch[:, :weights.shape[0]] for weights in self.__weights]
+            self.__batch_count = sample_count
+        return self.__batch_inputs, self.__batch_scratch
+
+    def activate_batch(self, inputs):
+        """Activates the network for each row of `inputs`, a 2-d array with a column for each input, and returns a 2-d array with the outputs of each row.
+        Gives the same outputs as calling `activate()` for each row, but all rows go through a layer with one matrix product
+        and the outputs of the layers are written into buffers that are reused as long as the number of rows stays the same.
+        Unlike `train()`, it does not keep any state for back-propagation.
+        """
+        inputs = np.asarray(inputs, dtype = np.float64)
+        if inputs.ndim != 2 or inputs.shape[1] != self.__input_count:
+            raise Exception('The inputs must be a 2-d array with {} columns, but they have shape {}.'.format(self.__input_count, inputs.shape))
+
+        layer_inputs, scratch = self.__batch_buffers(inputs.shape[0])
+        layer_inputs[0][:, :-1] = inputs
+        outputs = np.empty((inputs.shape[0], self.__weights[-1].shape[0]))
+        # The outputs of each layer are written in front of the bias column of the inputs of the next layer.
+        for weights, activations, layer_input, layer_output, layer_scratch in zip(self.__weights, self.__activations, layer_inputs, \
+            [buffer[:, :-1] for buffer in layer_inputs[1:]] + [outputs], scratch):
+            np.matmul(layer_input, weights.T, out = layer_output)
+            activate_in_place(activations, layer_output, layer_scratch)
+
+        return outputs
+
+    def __back_propagate(self, cost, learning_rate):
+        """Updates all weights once with back-propagation using the state of the last forward pass.
+
+        `cost` -- A 2-d array with for each sample of the forward pass the derivative of the cost function w.r.t. the output of each output neuron.
+        The weights are changed by the average of the weight deltas of the samples.
+        """
+        for weights, activations, layer_input, sums, outputs in reversed(list(zip(self.__weights, self.__activations, self.__layer_inputs, self.__sums, self.__outputs))):
+            # The Delta rule.
+            cost = cost * NeuralNetwork.__derive_layer(activations, sums, outputs)
 
-        NeuralNetwork.__activate_layer(self.__output_layer)
+            # Propagate the cost to the previous layer using the old weights. The bias does not propagate any cost.
+            previous_cost = cost @ weights[:, :-1]
 
-        # Sample the output.
-        output = np.empty(len(self.__output_layer))
-        for i, output_neuron in enumerate(self.__output_layer):
-            output[i] = output_neuron.get_output()
-        return output
+            # The product is the derivative of the cost w.r.t. each weight (it is proportional to it), summed over the samples,
+            # so to lower our cost we need to subtract it from our current weights.
+            weights -= (learning_rate / cost.shape[0]) * (cost.T @ layer_input)
+            cost = previous_cost
 
-    def train(self, inputs, desired_outputs, learning_rate, max_epochs):
+    def train(self, inputs, desired_outputs, learning_rate, max_epochs, batch_size = 1):
         """Trains the network using the back-propagation algorithm.
         
         `inputs` -- A 2-d array of numbers containing a set of input values to train with.
@@ -110,29 +187,37 @@ class NeuralNetwork:
         Set higher to learn faster and to escape local minima. Set lower to prevent overshooting.
         `max_loops` -- The number of training cycles that will be performed. A training cycle consists of
         doing back-propagation once for each row of `inputs`. The algorithm stops before this point if the error reaches `0`.
+        `batch_size` -- The number of rows of `inputs` that are run through the network at once with matrix operations.
+        The weights are updated once per batch with the average weight delta of its rows. With `1`, the weights are updated after every row
+        (stochastic gradient descent). Larger batches take far less time per epoch but usually need more epochs or a higher learning rate. (Default = `1`)
+
+        Returns a 1-d array with the sum of squared errors of each epoch.
         """
+        inputs, desired_outputs = np.asarray(inputs, dtype = np.float64), np.asarray(desired_outputs, dtype = np.float64)
         error = float('inf')
         errors = np.empty(max_epochs)
         for epoch in range(max_epochs):
             error = 0
-            for input, desired_output in zip(inputs, desired_outputs):
-                # Run the network with the input to determine its actual output
-                # This call also makes sure that the interal sum values of the neurons are up to date for this particular input sample.
-                actual_output = self.activate(input)
+            for start in range(0, inputs.shape[0], batch_size):
+                desired_output = desired_outputs[start:start + batch_size]
+
+                # Run the network with the batch to determine its actual output
+                # This call also makes sure that the interal sum values of the layers are up to date for this particular batch.
+                actual_output = self.__forward(inputs[start:start + batch_size])
                 error += ((desired_output - actual_output) ** 2).sum()
 
-                # Now compare the output to the expected response and update the network
-                for neuron, actual, desired in zip(self.__output_layer, actual_output, desired_output):
-                    # The cost of the output neurons is (actual - desired) because this is the derivative of our cost function w.r.t the activation value of our output neurons
-                    # since the cost function itself is (1/2 * (desired - actual) ^ 2).
-                    neuron.add_cost(actual - desired)
-                    neuron.update(learning_rate)
-                    
-                for layer in reversed(self.__hidden_layers):
-                    NeuralNetwork.__update_layer(layer, learning_rate)
+                # Now compare the output to the expected response and update the network.
+                # The cost of the output neurons is (actual - desired) because this is the derivative of our cost function w.r.t the activation value of our output neurons
+                # since the cost function itself is (1/2 * (desired - actual) ^ 2).
+                self.__back_propagate(actual_output - desired_output, learning_rate)
 
             errors[epoch] = error
             if error == 0:
                 break
 
-        return errors
\ No newline at end of file
+        return errors
+
+    def compile(self):
+        """Returns a `CompiledNetwork` with a copy of the current weights for fast, thread-safe inference.
+        Training the network afterwards does not change the compiled network."""
+        return CompiledNetwork([weights.copy() for weights in self.__weights], [list(neuron_activations) for neuron_activations in self.__neuron_activations])